@@ -0,0 +1,147 @@
+"""
+Content-addressed reuse of video job artifacts.
+
+A job is keyed by the SHA-256 of the uploaded file (or the canonical YouTube
+video ID) plus a fingerprint of the pipeline code and configuration. When a
+completed job with the same key exists, a new job gets its ai_screenshots,
+transcripts and notes through hardlinks instead of recomputing them.
+"""
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import time
+from urllib.parse import urlparse, parse_qs
+
+CACHE_DIR = "artifact_cache"
+ARTIFACT_ROOTS = ("ai_screenshots", "transcripts", "notes")
+
+# Source files whose code or constants (CLIP prompts, thresholds, Whisper and
+# Gemini models) determine the artifacts a job produces
+PIPELINE_SOURCES = (
+    "extract_diagram_frames.py",
+    "transcribe_whisper.py",
+    "extract_subtitles.py",
+    "generate_notes_gemini.py",
+    "media_prep.py",
+    "video_pipeline.py",
+    "youtube_download.py",
+    "text_chunking.py",
+)
+PIPELINE_ENV_VARS = ("TRANSCRIBE_WORKERS", "YTDLP_PROFILE", "NOTES_MODE", "NOTES_CHUNK_CHARS", "NOTES_MAX_CHUNKS")
+
+_FINGERPRINT = None
+
+YOUTUBE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+def pipeline_fingerprint():
+    """Hash of the pipeline sources and relevant settings, computed once per process."""
+    global _FINGERPRINT
+    if _FINGERPRINT is None:
+        digest = hashlib.sha256()
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in PIPELINE_SOURCES:
+            path = os.path.join(base_dir, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+        for var in PIPELINE_ENV_VARS:
+            digest.update(f"{var}={os.getenv(var, '')}".encode())
+        _FINGERPRINT = digest.hexdigest()[:16]
+    return _FINGERPRINT
+
+
+def canonical_video_id(url):
+    """Return 'youtube:<id>' for YouTube URLs, otherwise the normalized URL."""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    video_id = None
+    if host.endswith("youtu.be"):
+        video_id = parsed.path.lstrip("/").split("/")[0]
+    elif host.endswith("youtube.com") or host.endswith("youtube-nocookie.com"):
+        if parsed.path == "/watch":
+            video_id = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            parts = parsed.path.strip("/").split("/")
+            if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+                video_id = parts[1]
+    if video_id and YOUTUBE_ID_RE.match(video_id):
+        return f"youtube:{video_id}"
+    return f"url:{parsed.scheme}://{host}{parsed.path}?{parsed.query}"
+
+
+def cache_key(content_sha256=None, url=None):
+    """Key for a job input: file hash or canonical video ID, plus the pipeline fingerprint."""
+    source = f"sha256:{content_sha256}" if content_sha256 else canonical_video_id(url)
+    return hashlib.sha256(f"{source}|{pipeline_fingerprint()}".encode()).hexdigest()
+
+
+def lookup(key):
+    """Return the job_id of a completed job with this key whose artifacts still exist, or None."""
+    entry_path = os.path.join(CACHE_DIR, f"{key}.json")
+    try:
+        with open(entry_path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    job_id = entry.get("job_id")
+    if not job_id or not os.path.exists(os.path.join("notes", job_id, "notes.md")):
+        return None
+    return job_id
+
+
+def record(key, job_id, source=None):
+    """Remember that job_id produced the artifacts for key."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    entry_path = os.path.join(CACHE_DIR, f"{key}.json")
+    tmp_path = entry_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"job_id": job_id, "source": source, "created_at": time.time()}, f)
+    os.replace(tmp_path, entry_path)
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Cross-device or unsupported filesystem
+        shutil.copy2(src, dst)
+
+
+def reuse_artifacts(source_job_id, job_id):
+    """
+    Materialize source_job_id's artifacts under job_id.
+
+    Files are hardlinked. notes.md is rewritten instead, because it embeds
+    the job ID in its screenshot URLs and header.
+
+    Returns:
+        dict: {'source_job_id': str, 'files': int, 'seconds': float}
+    """
+    start = time.perf_counter()
+    files = 0
+    for root in ARTIFACT_ROOTS:
+        src_dir = os.path.join(root, source_job_id)
+        if not os.path.isdir(src_dir):
+            continue
+        dst_dir = os.path.join(root, job_id)
+        for dirpath, _, filenames in os.walk(src_dir):
+            target_dir = os.path.join(dst_dir, os.path.relpath(dirpath, src_dir))
+            os.makedirs(target_dir, exist_ok=True)
+            for name in filenames:
+                src = os.path.join(dirpath, name)
+                dst = os.path.join(target_dir, name)
+                if os.path.exists(dst):
+                    continue
+                if root == "notes" and name.endswith(".md"):
+                    with open(src, "r", encoding="utf-8") as f:
+                        content = f.read()
+                    with open(dst, "w", encoding="utf-8") as f:
+                        f.write(content.replace(source_job_id, job_id))
+                else:
+                    _link_or_copy(src, dst)
+                files += 1
+    return {'source_job_id': source_job_id, 'files': files, 'seconds': time.perf_counter() - start}
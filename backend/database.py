@@ -1,4 +1,5 @@
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os, ssl
@@ -16,3 +17,24 @@ engine = create_async_engine(
 )
 SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
+
+# Job/progress store shared by all uvicorn workers (SQLite locally by default)
+JOB_STORE_URL = os.getenv("JOB_STORE_URL", "sqlite+aiosqlite:///./notely_jobs.db")
+
+job_store_engine = create_async_engine(
+	JOB_STORE_URL,
+	future=True,
+	connect_args={"ssl": ssl_context} if JOB_STORE_URL.startswith("postgresql") else {}
+)
+
+if JOB_STORE_URL.startswith("sqlite"):
+	@event.listens_for(job_store_engine.sync_engine, "connect")
+	def _sqlite_pragmas(dbapi_connection, connection_record):
+		# WAL lets readers in other workers proceed while one worker flushes
+		cursor = dbapi_connection.cursor()
+		cursor.execute("PRAGMA journal_mode=WAL")
+		cursor.execute("PRAGMA busy_timeout=5000")
+		cursor.close()
+
+JobStoreSession = sessionmaker(job_store_engine, class_=AsyncSession, expire_on_commit=False)
+JobStoreBase = declarative_base()
@@ -0,0 +1,96 @@
+"""
+Document processing workers.
+
+Text extraction and note generation run as plain function calls in a
+long-lived process pool instead of one `python script.py` subprocess per step,
+so PyMuPDF, pdfplumber, python-docx and the Gemini client are imported once
+per worker rather than once per document. Workers are spawned (and warmed) at
+startup; documents.py chains the two steps with future callbacks so the
+upload request returns as soon as the file is on disk.
+"""
+
+import os
+import time
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+DOCUMENT_WORKERS = int(os.getenv("DOCUMENT_WORKERS", "2"))
+# Importing these pulls in fitz, pdfplumber, docx and google.generativeai
+WARM_MODULES = ("extract_text_from_document", "generate_notes_gemini")
+
+_POOL_LOCK = threading.Lock()
+_DOCUMENT_POOL = None
+
+
+def _warm_worker():
+    """Pool initializer: pay the heavy imports before the first document arrives."""
+    import importlib
+    for name in WARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Document worker could not preload {name}: {e}")
+
+
+def get_document_pool():
+    """Return the shared document pool, replacing it if a worker died and broke it."""
+    global _DOCUMENT_POOL
+    with _POOL_LOCK:
+        if _DOCUMENT_POOL is not None and getattr(_DOCUMENT_POOL, "_broken", False):
+            print("Document pool is broken, starting a new one")
+            _DOCUMENT_POOL.shutdown(wait=False, cancel_futures=True)
+            _DOCUMENT_POOL = None
+        if _DOCUMENT_POOL is None:
+            ctx = multiprocessing.get_context("spawn")
+            _DOCUMENT_POOL = ProcessPoolExecutor(max_workers=DOCUMENT_WORKERS, mp_context=ctx,
+                                                 initializer=_warm_worker)
+        return _DOCUMENT_POOL
+
+
+def _ready():
+    return os.getpid()
+
+
+def warm_document_pool():
+    """Start every worker now instead of on the first upload. Returns the worker PIDs."""
+    pool = get_document_pool()
+    futures = [pool.submit(_ready) for _ in range(DOCUMENT_WORKERS)]
+    return sorted({future.result() for future in futures})
+
+
+def extract_document_text(file_path, output_path):
+    """
+    Step 1: extract the document's text to output_path.
+
+    Returns:
+        dict: {
+            'chars': int,
+            'seconds': float,
+            'engines': dict or None  # PDF only: engine -> page count
+        }
+    """
+    from extract_text_from_document import extract_text
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # Only the stats come back; the text stays on disk
+    stats = extract_text(file_path, output_path)
+    return {'chars': stats['chars'], 'seconds': time.perf_counter() - start, 'engines': stats.get('engines')}
+
+
+def generate_document_notes(text_path, notes_path):
+    """
+    Step 2: generate Gemini notes from the extracted text.
+
+    Returns:
+        dict: {
+            'seconds': float,
+            'chunks': list or None  # chunked mode: [{'index', 'label', 'chars', 'seconds'}, ...]
+        }
+    """
+    from generate_notes_gemini import main as generate_notes
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(notes_path), exist_ok=True)
+    stats = {}
+    generate_notes(text_path, notes_path, stats=stats)
+    return {'seconds': time.perf_counter() - start, 'chunks': stats.get('chunks')}
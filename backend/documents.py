@@ -1,8 +1,11 @@
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import PlainTextResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from typing import List
 from schemas import DocumentMeta
+from uploads import receive_upload, MAX_DOCUMENT_UPLOAD_BYTES, DOCUMENT_KINDS
+from job_store import DOCUMENT_JOBS
+from progress_events import stream_progress
 import os
 from dotenv import load_dotenv
 
@@ -85,71 +88,93 @@ class ProgressUpdate(BaseModel):
     stage: str
     message: str
 
-# In-memory progress tracking
-PROGRESS_TRACKER = {}
-
+# Progress tracking in the shared job store (visible to every API worker)
 @router.get("/document/progress/{doc_id}")
-def get_document_progress(doc_id: str):
-    return PROGRESS_TRACKER.get(doc_id, {"progress": 0, "stage": "pending", "message": "Not started"})
+async def get_document_progress(doc_id: str):
+    job = await DOCUMENT_JOBS.get(doc_id)
+    if not job or not job['progress']:
+        return {"progress": 0, "stage": "pending", "message": "Not started"}
+    return job['progress']
+
+@router.get("/document/progress/{doc_id}/stream")
+async def stream_document_progress(doc_id: str, request: Request):
+    # Server-Sent Events: one event per progress change, closed after completed/error
+    default = {"progress": 0, "stage": "pending", "message": "Not started"}
+    return StreamingResponse(stream_progress(DOCUMENT_JOBS, doc_id, request, default),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 def update_progress(doc_id: str, progress: int, stage: str, message: str):
-    PROGRESS_TRACKER[doc_id] = {"progress": progress, "stage": stage, "message": message}
+    DOCUMENT_JOBS.set_progress(doc_id, {"progress": progress, "stage": stage, "message": message})
 
 @router.post("/document/upload/", response_model=dict)
-def upload_document(file: UploadFile = File(...)):
-    import subprocess
-    from fastapi import status
+async def upload_document(request: Request):
+    # Multipart form with a "file" field, read off the request stream so the
+    # size and type checks run before the whole body has arrived
     # Generate unique document ID
     import time
     doc_id = str(int(time.time()))
     
     update_progress(doc_id, 5, "uploading", "Saving uploaded file...")
     
-    # Save file to disk
-    file_location = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_location, "wb") as f:
-        f.write(file.file.read())
-
-    update_progress(doc_id, 20, "extracting", "Extracting text from document...")
-    
-    error_messages = []
-    extract_dir = os.path.join("extracted_text", doc_id)
-    os.makedirs(extract_dir, exist_ok=True)
-    extracted_txt = os.path.join(extract_dir, "extracted.txt")
-    # --- Document text extraction integration ---
+    # Stream file to disk (bounded memory, Content-Length and size limit, type check)
     try:
-        result = subprocess.run([
-            "python", "extract_text_from_document.py", file_location, extracted_txt
-        ], check=True, capture_output=True, text=True)
-        update_progress(doc_id, 50, "generating", "Generating notes with Gemini...")
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Document text extraction failed: {e.stderr or e.stdout or str(e)}"
-        error_messages.append(error_msg)
+        form = await receive_upload(request, lambda filename: os.path.join(UPLOAD_DIR, filename),
+                                    MAX_DOCUMENT_UPLOAD_BYTES, DOCUMENT_KINDS)
+        if form['file'] is None:
+            raise HTTPException(status_code=400, detail="No file uploaded.")
     except Exception as e:
-        error_msg = f"Document text extraction failed: {str(e)}"
-        error_messages.append(error_msg)
+        # Includes a client disconnect mid-upload; don't leave the document at "uploading"
+        update_progress(doc_id, 0, "error", e.detail if isinstance(e, HTTPException) else "Upload was interrupted")
+        raise
+    file_location = form['file']['path']
+
+    # Extraction and note generation run on the pre-warmed document pool;
+    # clients follow progress through /document/progress
+    process_document(doc_id, file_location)
+
+    return {"document_id": doc_id, "message": "Document uploaded, processing started", "filename": form['file']['filename']}
 
-    # --- Gemini note generation integration ---
+
+def process_document(doc_id: str, file_location: str):
+    """Chain text extraction and note generation on the document pool without blocking the caller."""
+    from document_pipeline import get_document_pool, extract_document_text, generate_document_notes
+    extract_dir = os.path.join("extracted_text", doc_id)
     notes_dir = os.path.join("notes", doc_id)
+    os.makedirs(extract_dir, exist_ok=True)
     os.makedirs(notes_dir, exist_ok=True)
+    extracted_txt = os.path.join(extract_dir, "extracted.txt")
     notes_md = os.path.join(notes_dir, "notes.md")
-    try:
-        result = subprocess.run([
-            "python", "generate_notes_gemini.py", extracted_txt, notes_md
-        ], check=True, capture_output=True, text=True)
+
+    def on_notes_done(future):
+        try:
+            result = future.result()
+        except Exception as e:
+            update_progress(doc_id, 50, "error", f"Gemini note generation failed: {str(e)}")
+            return
+        chunks = f" from {len(result['chunks'])} chunks" if result['chunks'] else ""
+        print(f"Document {doc_id}: notes generated in {result['seconds']:.1f}s{chunks}")
         update_progress(doc_id, 100, "completed", "Notes generated successfully!")
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Gemini note generation failed: {e.stderr or e.stdout or str(e)}"
-        error_messages.append(error_msg)
-    except Exception as e:
-        error_msg = f"Gemini note generation failed: {str(e)}"
-        error_messages.append(error_msg)
-    # --- End Gemini integration ---
 
-    if error_messages:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="; ".join(error_messages))
+    def on_extract_done(future):
+        try:
+            result = future.result()
+        except Exception as e:
+            update_progress(doc_id, 20, "error", f"Document text extraction failed: {str(e)}")
+            return
+        engines = f" (pages per engine: {result['engines']})" if result['engines'] else ""
+        print(f"Document {doc_id}: extracted {result['chars']} characters in {result['seconds']:.1f}s{engines}")
+        update_progress(doc_id, 50, "generating", "Generating notes with Gemini...")
+        try:
+            # Fetched again so a pool broken by the first step has been replaced
+            future = get_document_pool().submit(generate_document_notes, extracted_txt, notes_md)
+        except Exception as e:
+            update_progress(doc_id, 50, "error", f"Gemini note generation failed: {str(e)}")
+            return
+        future.add_done_callback(on_notes_done)
 
-    return {"document_id": doc_id, "message": "Document processed successfully", "filename": file.filename}
+    update_progress(doc_id, 20, "extracting", "Extracting text from document...")
+    get_document_pool().submit(extract_document_text, file_location, extracted_txt).add_done_callback(on_extract_done)
 
 @router.get("/document/list/", response_model=List[DocumentMeta])
 def list_documents():
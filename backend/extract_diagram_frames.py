@@ -1,14 +1,33 @@
 import os
+import time
+import threading
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import cv2
+import numpy as np
 import torch
 import clip
-import json
 from PIL import Image
 from tqdm import tqdm
+from frame_metadata import FrameMetadataWriter
 
 # CONFIG
+CLIP_MODEL_NAME = "ViT-B/32"
 FRAME_INTERVAL = 0.5  # seconds between frames to check (more frequent)
 SIMILARITY_THRESHOLD = 0.22  # lower threshold for more sensitivity
+BATCH_SIZE = 16  # sampled frames encoded together in one CLIP forward pass
+SCENE_CHANGE_THRESHOLD = 2.0  # mean abs pixel difference (0-255) on a small grayscale thumbnail below which a sample is skipped; None disables
+DEDUP_HASH_DISTANCE = 4  # max Hamming distance (out of 64 bits) to the last kept frame for a sample to be dropped; None disables
+# "grab" decodes every frame but converts only samples, "seek" jumps straight to each sample,
+# "auto" picks seek when samples are further apart than the video's keyframes
+SAMPLING_MODE = os.getenv("FRAME_SAMPLING_MODE", "auto")
+PIPELINED = True  # overlap decoding, CLIP scoring and JPEG writing in separate threads
+DECODE_QUEUE_SIZE = 64  # max decoded candidates waiting to be scored
+WRITE_QUEUE_SIZE = 64  # max scored frames waiting to be written to disk
+WRITER_THREADS = 4  # threads encoding and saving JPEGs
+PARALLEL_WORKERS = 1  # processes used to analyze time segments of one video concurrently
+MIN_SEGMENT_SECONDS = 60  # don't split videos into segments shorter than this
 PROMPTS = [
     "a diagram", 
     "a slide presentation", 
@@ -25,76 +44,510 @@ PROMPTS = [
 ]
 
 
-def extract_relevant_frames(video_path, output_dir):
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model, preprocess = clip.load("ViT-B/32", device=device)
-    os.makedirs(output_dir, exist_ok=True)
+# Process-wide CLIP cache: the model is loaded once per worker and the prompt
+# embeddings are only re-encoded when the prompt list changes.
+_CLIP_LOCK = threading.Lock()
+_CLIP_CACHE = {
+    'model_name': None,
+    'device': None,
+    'model': None,
+    'preprocess': None,
+    'prompts': None,
+    'text_features': None,
+}
+CLIP_CACHE_STATS = {
+    'hits': 0,
+    'misses': 0,
+    'model_loads': 0,
+    'text_encodes': 0,
+    'model_load_seconds': 0.0,
+    'text_encode_seconds': 0.0,
+}
+
+
+def get_clip_model(model_name=CLIP_MODEL_NAME, prompts=None, device=None):
+    """Return (model, preprocess, text_features, device) from the process-wide cache.
+
+    The model is reloaded only when model_name or device changes, and the text
+    features only when the prompt list changes.
+    """
+    prompts = tuple(prompts if prompts is not None else PROMPTS)
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    with _CLIP_LOCK:
+        cache = _CLIP_CACHE
+        if (cache['model'] is not None and cache['model_name'] == model_name
+                and cache['device'] == device and cache['prompts'] == prompts):
+            CLIP_CACHE_STATS['hits'] += 1
+            return cache['model'], cache['preprocess'], cache['text_features'], device
+
+        CLIP_CACHE_STATS['misses'] += 1
+        if cache['model'] is None or cache['model_name'] != model_name or cache['device'] != device:
+            start = time.perf_counter()
+            model, preprocess = clip.load(model_name, device=device)
+            model.eval()
+            CLIP_CACHE_STATS['model_loads'] += 1
+            CLIP_CACHE_STATS['model_load_seconds'] += time.perf_counter() - start
+            cache.update({'model_name': model_name, 'device': device, 'model': model,
+                          'preprocess': preprocess, 'prompts': None, 'text_features': None})
+
+        # Prepare text prompts
+        start = time.perf_counter()
+        text_tokens = clip.tokenize(list(prompts)).to(device)
+        with torch.no_grad():
+            text_features = cache['model'].encode_text(text_tokens)
+            text_features /= text_features.norm(dim=-1, keepdim=True)
+        CLIP_CACHE_STATS['text_encodes'] += 1
+        CLIP_CACHE_STATS['text_encode_seconds'] += time.perf_counter() - start
+        cache.update({'prompts': prompts, 'text_features': text_features})
+        return cache['model'], cache['preprocess'], text_features, device
+
+
+def warm_clip_model():
+    """Load CLIP and encode PROMPTS ahead of the first job (e.g. at API startup)."""
+    get_clip_model()
+    return get_clip_cache_stats()
+
+
+def get_clip_cache_stats():
+    stats = dict(CLIP_CACHE_STATS)
+    stats['loaded_model'] = _CLIP_CACHE['model_name']
+    stats['device'] = _CLIP_CACHE['device']
+    return stats
 
-    # Prepare text prompts
-    text_tokens = clip.tokenize(PROMPTS).to(device)
+
+def score_frames_batch(model, preprocess, text_features, images, device):
+    """Encode a batch of PIL images with CLIP and score them against the text prompts.
+
+    Returns a list of (max_similarity, prompt_idx) tuples, one per image.
+    """
+    image_input = torch.stack([preprocess(img) for img in images]).to(device)
     with torch.no_grad():
-        text_features = model.encode_text(text_tokens)
-        text_features /= text_features.norm(dim=-1, keepdim=True)
+        image_features = model.encode_image(image_input)
+        image_features /= image_features.norm(dim=-1, keepdim=True)
+        similarity = (100.0 * image_features @ text_features.T).softmax(dim=-1)
+        max_sims, idxs = similarity.max(dim=-1)
+    return list(zip(max_sims.tolist(), idxs.tolist()))
+
+
+def save_frame(frame_idx, img, confidence, prompt_idx, fps, output_dir, metadata_sink):
+    """Write one kept frame to disk, then record its metadata. Returns seconds spent."""
+    start = time.perf_counter()
+    timestamp = frame_idx / fps
+    out_path = os.path.join(output_dir, f"frame_{frame_idx:06d}_t{timestamp:.1f}s.jpg")
+    img.save(out_path)
+
+    # Save metadata about this frame
+    metadata = {
+        'frame_idx': frame_idx,
+        'timestamp': timestamp,
+        'prompt_matched': PROMPTS[prompt_idx],
+        'confidence': confidence,
+        'filename': os.path.basename(out_path)
+    }
+    metadata_sink.append(metadata)
+    return time.perf_counter() - start
+
+
+def save_relevant_frames(batch, scores, fps, output_dir, metadata_writer):
+    """Save the frames of a scored batch that pass the similarity threshold.
+
+    Returns the number of frames saved.
+    """
+    saved = 0
+    for (frame_idx, img), (confidence, prompt_idx) in zip(batch, scores):
+        if confidence <= SIMILARITY_THRESHOLD:
+            continue
+        save_frame(frame_idx, img, confidence, prompt_idx, fps, output_dir, metadata_writer)
+        saved += 1
+    return saved
+
+
+def scene_thumbnail(frame, size=(64, 36)):
+    """Downscaled grayscale copy of a BGR frame for cheap frame-to-frame comparison."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+
+def scene_changed(thumb, reference, threshold=SCENE_CHANGE_THRESHOLD):
+    """True when thumb differs enough from the reference thumbnail to be worth scoring."""
+    if reference is None:
+        return True
+    return float(cv2.absdiff(thumb, reference).mean()) >= threshold
+
+
+def frame_dhash(frame):
+    """64-bit difference hash of a BGR frame, robust to compression noise and small shifts."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def iter_sampled_frames(vidcap, frame_interval, frame_count, mode=SAMPLING_MODE, stats=None,
+                        start_frame=0, end_frame=None):
+    """Yield (frame_idx, BGR frame) for every frame_interval-th frame of the video.
+
+    In "grab" mode every frame is grabbed, and with OpenCV's FFmpeg backend
+    grab() decodes the frame; skipping only avoids retrieve(), i.e. the
+    conversion to a BGR image. "seek" mode is the only one that avoids
+    decoding: the capture jumps to the keyframe before each sample and decodes
+    forward from there, which saves work only when frame_interval is longer
+    than the keyframe spacing. Only frames in [start_frame, end_frame) are
+    visited; end_frame=None reads to the end.
+
+    Counters are accumulated into `stats` when given: 'grabbed' and
+    'decoded' count frames read by grab() ('decoded' is a lower bound in seek
+    mode, where the frames between the keyframe and the sample are decoded
+    inside the seek), 'retrieved' counts frames converted to images and
+    'sampled' the frames yielded.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault('grabbed', 0)
+    stats.setdefault('decoded', 0)
+    stats.setdefault('retrieved', 0)
+    stats.setdefault('sampled', 0)
+
+    if mode == "seek":
+        first = -(-start_frame // frame_interval) * frame_interval
+        last = frame_count if end_frame is None else min(end_frame, frame_count)
+        for frame_idx in range(first, last, frame_interval):
+            vidcap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = vidcap.read()
+            if not ret:
+                break
+            stats['decoded'] += 1
+            stats['retrieved'] += 1
+            stats['sampled'] += 1
+            yield frame_idx, frame
+        return
+
+    if start_frame:
+        vidcap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frame_idx = start_frame
+    while (end_frame is None or frame_idx < end_frame) and vidcap.grab():
+        stats['grabbed'] += 1
+        stats['decoded'] += 1
+        if frame_idx % frame_interval == 0:
+            ret, frame = vidcap.retrieve()
+            if not ret:
+                break
+            stats['retrieved'] += 1
+            stats['sampled'] += 1
+            yield frame_idx, frame
+        frame_idx += 1
+
+
+def resolve_sampling_mode(video_path, fps, frame_interval, mode=SAMPLING_MODE):
+    """Turn "auto" into "seek" or "grab" for this video; other modes are returned unchanged.
+
+    A seek decodes from the keyframe before the sample, so it beats grabbing
+    every frame only when frame_interval is longer than the keyframe spacing.
+    """
+    if mode != "auto":
+        return mode
+    from media_prep import probe_keyframe_interval
+    keyframe_seconds = probe_keyframe_interval(video_path)
+    if keyframe_seconds is None or fps <= 0:
+        return "grab"
+    keyframe_frames = keyframe_seconds * fps
+    mode = "seek" if frame_interval > keyframe_frames else "grab"
+    print(f"Keyframes every {keyframe_frames:.0f} frames, sampling every {frame_interval}: using {mode} mode")
+    return mode
+
+
+def iter_candidate_frames(vidcap, frame_interval, frame_count, stats, start_frame=0, end_frame=None,
+                          sampling_mode=SAMPLING_MODE, dedup_distance=DEDUP_HASH_DISTANCE,
+                          scene_threshold=SCENE_CHANGE_THRESHOLD, pbar=None):
+    """Decode stage: yield (frame_idx, PIL image) for samples that survive the pre-filter and dedup."""
+    stats.setdefault('prefilter_skipped', 0)
+    stats.setdefault('duplicates_dropped', 0)
+    last_thumb = None  # thumbnail of the last sample that passed the pixel-difference pre-filter
+    last_hash = None  # hash of the last sample that made it past dedup
+    last_idx = start_frame
+    for frame_idx, frame in iter_sampled_frames(vidcap, frame_interval, frame_count, sampling_mode, stats,
+                                                start_frame, end_frame):
+        if pbar is not None:
+            pbar.update(frame_idx - last_idx)
+        last_idx = frame_idx
+
+        # Cheap first stage: only samples with a visible scene change go on to CLIP
+        if scene_threshold is not None:
+            thumb = scene_thumbnail(frame)
+            if not scene_changed(thumb, last_thumb, scene_threshold):
+                stats['prefilter_skipped'] += 1
+                continue
+            last_thumb = thumb
+
+        # Drop near-duplicates of the last kept sample before any conversion, scoring or saving
+        if dedup_distance is not None:
+            frame_hash = frame_dhash(frame)
+            if last_hash is not None and hamming_distance(frame_hash, last_hash) <= dedup_distance:
+                stats['duplicates_dropped'] += 1
+                continue
+            last_hash = frame_hash
+
+        # Convert frame to PIL Image
+        yield frame_idx, Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def _run_sequential(candidates, clip_state, batch_size, fps, output_dir, metadata_sink, stats):
+    model, preprocess, text_features, device = clip_state
+    saved = 0
+    batch = []  # (frame_idx, PIL image) pairs waiting to be scored
+    for candidate in candidates:
+        batch.append(candidate)
+        if len(batch) >= batch_size:
+            stats['clip_frames_scored'] += len(batch)
+            scores = score_frames_batch(model, preprocess, text_features, [img for _, img in batch], device)
+            saved += save_relevant_frames(batch, scores, fps, output_dir, metadata_sink)
+            batch = []
+    # Score whatever is left over in the final partial batch
+    if batch:
+        stats['clip_frames_scored'] += len(batch)
+        scores = score_frames_batch(model, preprocess, text_features, [img for _, img in batch], device)
+        saved += save_relevant_frames(batch, scores, fps, output_dir, metadata_sink)
+    return saved
+
+
+def _run_pipelined(candidates, clip_state, batch_size, fps, output_dir, metadata_sink, stats,
+                   decode_queue_size=DECODE_QUEUE_SIZE, write_queue_size=WRITE_QUEUE_SIZE,
+                   writer_threads=WRITER_THREADS):
+    """Decoder thread -> bounded queue -> batched CLIP scoring -> writer thread pool."""
+    model, preprocess, text_features, device = clip_state
+    decoded = queue.Queue(maxsize=decode_queue_size)
+    done = object()
+    stop = threading.Event()
+    decoder_error = []
+    stats.update({'decode_seconds': 0.0, 'decode_blocked_seconds': 0.0, 'score_seconds': 0.0,
+                  'write_seconds': 0.0, 'write_blocked_seconds': 0.0,
+                  'max_decode_queue': 0, 'max_write_queue': 0})
+
+    def decode():
+        start = time.perf_counter()
+        try:
+            for candidate in candidates:
+                if stop.is_set():
+                    break
+                put_start = time.perf_counter()
+                decoded.put(candidate)
+                stats['decode_blocked_seconds'] += time.perf_counter() - put_start
+        except Exception as e:
+            decoder_error.append(e)
+        finally:
+            stats['decode_seconds'] = time.perf_counter() - start - stats['decode_blocked_seconds']
+            decoded.put(done)
+
+    decoder = threading.Thread(target=decode, name="frame-decoder", daemon=True)
+    decoder.start()
+
+    saved = 0
+    pending = []  # write futures, oldest first
+    with ThreadPoolExecutor(max_workers=writer_threads, thread_name_prefix="frame-writer") as writers:
+        def score_and_submit(batch):
+            nonlocal saved
+            stats['clip_frames_scored'] += len(batch)
+            score_start = time.perf_counter()
+            scores = score_frames_batch(model, preprocess, text_features, [img for _, img in batch], device)
+            stats['score_seconds'] += time.perf_counter() - score_start
+            for (frame_idx, img), (confidence, prompt_idx) in zip(batch, scores):
+                if confidence <= SIMILARITY_THRESHOLD:
+                    continue
+                # Backpressure: wait for the oldest write when too many are in flight
+                while len(pending) >= write_queue_size:
+                    wait_start = time.perf_counter()
+                    stats['write_seconds'] += pending.pop(0).result()
+                    stats['write_blocked_seconds'] += time.perf_counter() - wait_start
+                pending.append(writers.submit(save_frame, frame_idx, img, confidence, prompt_idx,
+                                              fps, output_dir, metadata_sink))
+                stats['max_write_queue'] = max(stats['max_write_queue'], len(pending))
+                saved += 1
+
+        batch = []
+        try:
+            while True:
+                stats['max_decode_queue'] = max(stats['max_decode_queue'], decoded.qsize())
+                candidate = decoded.get()
+                if candidate is done:
+                    break
+                batch.append(candidate)
+                if len(batch) >= batch_size:
+                    score_and_submit(batch)
+                    batch = []
+            if batch:
+                score_and_submit(batch)
+        except BaseException:
+            # Unblock the decoder so it can exit before the capture is released
+            stop.set()
+            while decoded.get() is not done:
+                pass
+            raise
+        for future in pending:
+            stats['write_seconds'] += future.result()
+
+    decoder.join()
+    if decoder_error:
+        raise decoder_error[0]
+    return saved
+
+
+def extract_frame_range(video_path, output_dir, metadata_sink, start_frame=0, end_frame=None,
+                        batch_size=BATCH_SIZE, sampling_mode=SAMPLING_MODE,
+                        dedup_distance=DEDUP_HASH_DISTANCE, scene_threshold=SCENE_CHANGE_THRESHOLD,
+                        pipelined=PIPELINED, show_progress=True):
+    """Analyze frames [start_frame, end_frame) of a video with its own capture.
+
+    Kept frames are saved to output_dir and their metadata appended to
+    metadata_sink (a FrameMetadataWriter or a plain list). Returns the stats.
+    """
+    clip_state = get_clip_model()
+    batch_size = max(1, int(batch_size))
 
     # Open video
     vidcap = cv2.VideoCapture(video_path)
     fps = vidcap.get(cv2.CAP_PROP_FPS)
     frame_count = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
-    duration = frame_count / fps
-    frame_interval = int(fps * FRAME_INTERVAL)
+    frame_interval = max(1, int(fps * FRAME_INTERVAL))
+    sampling_mode = resolve_sampling_mode(video_path, fps, frame_interval, sampling_mode)
+    range_end = frame_count if end_frame is None else min(end_frame, frame_count)
 
-    frame_idx = 0
-    saved = 0
-    pbar = tqdm(total=frame_count, desc="Analyzing frames")
-    while True:
-        ret, frame = vidcap.read()
-        if not ret:
-            break
-        if frame_idx % frame_interval == 0:
-            # Convert frame to PIL Image
-            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            image_input = preprocess(img).unsqueeze(0).to(device)
-            with torch.no_grad():
-                image_features = model.encode_image(image_input)
-                image_features /= image_features.norm(dim=-1, keepdim=True)
-                similarity = (100.0 * image_features @ text_features.T).softmax(dim=-1)
-                max_sim, idx = similarity[0].max(0)
-                if max_sim.item() > SIMILARITY_THRESHOLD:
-                    timestamp = frame_idx / fps
-                    out_path = os.path.join(output_dir, f"frame_{frame_idx:06d}_t{timestamp:.1f}s.jpg")
-                    img.save(out_path)
-                    saved += 1
-                    
-                    # Save metadata about this frame
-                    prompt_idx = idx.item()
-                    confidence = max_sim.item()
-                    metadata = {
-                        'frame_idx': frame_idx,
-                        'timestamp': timestamp,
-                        'prompt_matched': PROMPTS[prompt_idx],
-                        'confidence': confidence,
-                        'filename': os.path.basename(out_path)
-                    }
-                    
-                    # Save metadata to JSON file
-                    metadata_path = os.path.join(output_dir, "frame_metadata.json")
-                    if os.path.exists(metadata_path):
-                        with open(metadata_path, "r") as f:
-                            all_metadata = json.load(f)
-                    else:
-                        all_metadata = []
-                    all_metadata.append(metadata)
-                    with open(metadata_path, "w") as f:
-                        json.dump(all_metadata, f, indent=2)
-        frame_idx += 1
-        pbar.update(1)
-    pbar.close()
+    stats = {'clip_frames_scored': 0}
+    pbar = tqdm(total=max(0, range_end - start_frame), desc="Analyzing frames", disable=not show_progress)
+    candidates = iter_candidate_frames(vidcap, frame_interval, frame_count, stats, start_frame, end_frame,
+                                       sampling_mode, dedup_distance, scene_threshold, pbar)
+    try:
+        if pipelined:
+            saved = _run_pipelined(candidates, clip_state, batch_size, fps, output_dir, metadata_sink, stats)
+        else:
+            saved = _run_sequential(candidates, clip_state, batch_size, fps, output_dir, metadata_sink, stats)
+    finally:
+        pbar.close()
+        vidcap.release()
+    stats['kept'] = saved
+    return stats
+
+
+def split_into_segments(frame_count, fps, frame_interval, workers):
+    """Split [0, frame_count) into up to `workers` ranges aligned to frame_interval."""
+    if frame_count <= 0:
+        return [(0, None)]
+    min_frames = max(frame_interval, int(fps * MIN_SEGMENT_SECONDS))
+    segments_wanted = max(1, min(workers, frame_count // min_frames))
+    samples = -(-frame_count // frame_interval)
+    per_segment = -(-samples // segments_wanted) * frame_interval
+    segments = []
+    for start in range(0, frame_count, per_segment):
+        segments.append((start, min(start + per_segment, frame_count)))
+    # Let the last segment read to EOF in case the container under-reports its frame count
+    if segments:
+        segments[-1] = (segments[-1][0], None)
+    return segments or [(0, None)]
+
+
+def _extract_segment(args):
+    """Process-pool entry point: analyze one segment and return (metadata, stats)."""
+    video_path, output_dir, start_frame, end_frame, threads, options = args
+    torch.set_num_threads(threads)
+    metadata = []
+    stats = extract_frame_range(video_path, output_dir, metadata, start_frame, end_frame,
+                                show_progress=False, **options)
+    metadata.sort(key=lambda x: x['frame_idx'])
+    return metadata, stats
+
+
+_SEGMENT_POOL_LOCK = threading.Lock()
+_SEGMENT_POOL = None
+
+
+def get_segment_pool(workers=PARALLEL_WORKERS):
+    """
+    Return this process's long-lived segment pool, replacing it if a worker died and broke it.
+
+    Created on the first multi-segment video and kept for later ones, so each
+    segment worker loads CLIP and encodes the prompts once (see get_clip_model)
+    instead of once per video.
+    """
+    global _SEGMENT_POOL
+    with _SEGMENT_POOL_LOCK:
+        if _SEGMENT_POOL is not None and getattr(_SEGMENT_POOL, "_broken", False):
+            print("Frame segment pool is broken, starting a new one")
+            _SEGMENT_POOL.shutdown(wait=False, cancel_futures=True)
+            _SEGMENT_POOL = None
+        if _SEGMENT_POOL is None:
+            _SEGMENT_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _SEGMENT_POOL
+
+
+def extract_relevant_frames(video_path, output_dir, batch_size=BATCH_SIZE, sampling_mode=SAMPLING_MODE,
+                            dedup_distance=DEDUP_HASH_DISTANCE, scene_threshold=SCENE_CHANGE_THRESHOLD,
+                            workers=PARALLEL_WORKERS, pipelined=PIPELINED):
+    os.makedirs(output_dir, exist_ok=True)
+    options = {
+        'pipelined': pipelined,
+        'batch_size': batch_size,
+        'sampling_mode': sampling_mode,
+        'dedup_distance': dedup_distance,
+        'scene_threshold': scene_threshold,
+    }
+
+    # Probe the video to decide how to split it
+    vidcap = cv2.VideoCapture(video_path)
+    fps = vidcap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
     vidcap.release()
-    print(f"Saved {saved} relevant frames to {output_dir}")
+    frame_interval = max(1, int(fps * FRAME_INTERVAL))
+    segments = split_into_segments(frame_count, fps, frame_interval, workers) if workers > 1 else [(0, None)]
+    # Probe once here rather than in every segment worker
+    options['sampling_mode'] = resolve_sampling_mode(video_path, fps, frame_interval, sampling_mode)
+
+    with FrameMetadataWriter(output_dir) as metadata_writer:
+        if len(segments) == 1:
+            stats = extract_frame_range(video_path, output_dir, metadata_writer, **options)
+        else:
+            # Each worker seeks its own capture to the segment start; results come
+            # back in segment order so the merged metadata stays timestamp-ordered.
+            threads = max(1, (os.cpu_count() or 1) // len(segments))
+            jobs = [(video_path, output_dir, start, end, threads, options) for start, end in segments]
+            stats = {}
+            futures = [get_segment_pool(workers).submit(_extract_segment, job) for job in jobs]
+            try:
+                for future in futures:
+                    metadata, segment_stats = future.result()
+                    for entry in metadata:
+                        metadata_writer.append(entry)
+                    for key, value in segment_stats.items():
+                        if key.startswith('max_'):
+                            stats[key] = max(stats.get(key, 0), value)
+                        else:
+                            stats[key] = stats.get(key, 0) + value
+            finally:
+                # The pool outlives this video; drop segments nobody will read
+                for future in futures:
+                    future.cancel()
+
+    stats['segments'] = len(segments)
+    stats['clip_calls_avoided'] = stats['prefilter_skipped'] + stats['duplicates_dropped']
+    print(f"Decoded {stats['decoded']} of {frame_count} frames, retrieved {stats['retrieved']} as images "
+          f"({stats['sampled']} sampled, {stats['kept']} kept)")
+    print(f"Skipped {stats['prefilter_skipped']} unchanged and {stats['duplicates_dropped']} near-duplicate frames "
+          f"({stats['clip_calls_avoided']} CLIP calls avoided, {stats['clip_frames_scored']} scored)")
+    if pipelined:
+        print(f"Stage timings: decode {stats['decode_seconds']:.1f}s, score {stats['score_seconds']:.1f}s, "
+              f"write {stats['write_seconds']:.1f}s (max queue depth decode={stats['max_decode_queue']}, "
+              f"write={stats['max_write_queue']})")
+    print(f"Saved {stats['kept']} relevant frames to {output_dir} using {len(segments)} segment(s)")
+    return stats
 
 if __name__ == "__main__":
     import sys
-    if len(sys.argv) != 3:
-        print("Usage: python extract_diagram_frames.py <video_path> <output_dir>")
+    if len(sys.argv) not in (3, 4, 5, 6):
+        print("Usage: python extract_diagram_frames.py <video_path> <output_dir> [batch_size] [auto|grab|seek] [workers]")
         exit(1)
-    extract_relevant_frames(sys.argv[1], sys.argv[2])
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else BATCH_SIZE
+    sampling_mode = sys.argv[4] if len(sys.argv) > 4 else SAMPLING_MODE
+    workers = int(sys.argv[5]) if len(sys.argv) > 5 else PARALLEL_WORKERS
+    extract_relevant_frames(sys.argv[1], sys.argv[2], batch_size, sampling_mode, workers=workers)
@@ -220,13 +220,16 @@ def parse_vtt_timestamp(timestamp_str):
         return 0.0
 
 
-def extract_and_process_subtitles(url, output_dir):
+def extract_and_process_subtitles(url, output_dir, subtitle_track=None):
     """
     Complete pipeline: extract subtitles and process them to clean text.
     
     Args:
         url (str): YouTube video URL
         output_dir (str): Directory to save files
+        subtitle_track (dict): Optional track already downloaded together with the
+            video ({'subtitle_file', 'language', 'method'}, see
+            youtube_download.fetch_video); skips the yt-dlp lookup entirely
         
     Returns:
         dict: {
@@ -239,8 +242,11 @@ def extract_and_process_subtitles(url, output_dir):
             'error': str or None
         }
     """
-    # Step 1: Extract subtitles
-    extract_result = extract_youtube_subtitles(url, output_dir)
+    # Step 1: Extract subtitles (unless they were fetched with the video)
+    if subtitle_track and os.path.exists(subtitle_track['subtitle_file']):
+        extract_result = dict(subtitle_track, success=True, error=None)
+    else:
+        extract_result = extract_youtube_subtitles(url, output_dir)
     
     if not extract_result['success']:
         return {
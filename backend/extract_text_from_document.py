@@ -1,30 +1,208 @@
 import os
+import json
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
 import pdfplumber
 import docx
 
+# Page-sharded PDF extraction: shards of PDF_PAGES_PER_SHARD pages are
+# extracted by PDF_WORKERS processes, each with its own PyMuPDF handle
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_SHARD = int(os.getenv("PDF_PAGES_PER_SHARD", "32"))
+MIN_PARALLEL_PAGES = 64  # below this, starting workers costs more than it saves
+PAGE_INDEX_SUFFIX = ".pages.json"  # sidecar next to the extracted text
+SLOWEST_PAGES_REPORTED = 5
+
+_SHARD_POOL_LOCK = threading.Lock()
+_SHARD_POOL = None
+
+def _extract_pdf_shard(file_path, start, end):
+    """
+    Worker: text of pages [start, end).
+
+    PyMuPDF handles every page; only pages it returns empty are re-extracted
+    with pdfplumber, so scanned or odd pages in a mixed document don't cost a
+    second parse of the whole file.
+
+    Returns:
+        list: [(text, {'engine': 'pymupdf' | 'pdfplumber' | 'none', 'seconds': float}), ...]
+    """
+    results = []
+    with fitz.open(file_path) as doc:
+        for i in range(start, end):
+            page_start = time.perf_counter()
+            try:
+                text = doc[i].get_text()
+            except Exception as e:
+                print(f"[WARN] PyMuPDF failed on page {i + 1}: {e}")
+                text = ""
+            results.append((text, {'engine': 'pymupdf', 'seconds': time.perf_counter() - page_start}))
+    empty = [offset for offset, (text, _) in enumerate(results) if not text.strip()]
+    if not empty:
+        return results
+    try:
+        # pdfplumber takes 1-based page numbers and only loads those pages
+        with pdfplumber.open(file_path, pages=[start + offset + 1 for offset in empty]) as pdf:
+            for offset, page in zip(empty, pdf.pages):
+                page_start = time.perf_counter()
+                text = page.extract_text() or ""
+                info = dict(results[offset][1], engine='pdfplumber' if text.strip() else 'none')
+                info['seconds'] += time.perf_counter() - page_start
+                results[offset] = (text if text.strip() else results[offset][0], info)
+    except Exception as e:
+        print(f"[WARN] pdfplumber failed on pages {start + 1}-{end}: {e}")
+        for offset in empty:
+            results[offset] = (results[offset][0], dict(results[offset][1], engine='none'))
+    return results
+
+def get_shard_pool(workers=PDF_WORKERS):
+    """
+    Return this process's long-lived shard pool, replacing it if a worker died and broke it.
+
+    Created on the first large PDF and kept for later ones, so each document
+    worker pays for spawning shard workers and importing fitz/pdfplumber once.
+    """
+    global _SHARD_POOL
+    with _SHARD_POOL_LOCK:
+        if _SHARD_POOL is not None and getattr(_SHARD_POOL, "_broken", False):
+            print("PDF shard pool is broken, starting a new one")
+            _SHARD_POOL.shutdown(wait=False, cancel_futures=True)
+            _SHARD_POOL = None
+        if _SHARD_POOL is None:
+            _SHARD_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _SHARD_POOL
+
+def iter_pdf_pages(file_path, workers=PDF_WORKERS, pages_per_shard=PDF_PAGES_PER_SHARD):
+    """Yield (page_index, text, info) in page order, extracting shards in parallel worker processes."""
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+    shards = [(start, min(start + pages_per_shard, page_count)) for start in range(0, page_count, pages_per_shard)]
+    if workers <= 1 or page_count < MIN_PARALLEL_PAGES:
+        for start, end in shards:
+            for offset, (text, info) in enumerate(_extract_pdf_shard(file_path, start, end)):
+                yield start + offset, text, info
+        return
+    pool = get_shard_pool(workers)
+    futures = [pool.submit(_extract_pdf_shard, file_path, start, end) for start, end in shards]
+    try:
+        # Shards finish in any order; yielding them in submission order keeps the text ordered
+        for (start, _), future in zip(shards, futures):
+            for offset, (text, info) in enumerate(future.result()):
+                yield start + offset, text, info
+    finally:
+        # The pool outlives this document; drop shards nobody will read
+        for future in futures:
+            future.cancel()
+
+def _iter_pdfplumber_pages(file_path):
+    # Whole-document fallback for files PyMuPDF can't open at all
+    with pdfplumber.open(file_path) as pdf:
+        for i, page in enumerate(pdf.pages):
+            page_start = time.perf_counter()
+            text = page.extract_text() or ""
+            yield i, text, {'engine': 'pdfplumber' if text.strip() else 'none',
+                            'seconds': time.perf_counter() - page_start}
+
+def summarize_pages(index):
+    """
+    Engine choice and timing over a page index.
+
+    Returns:
+        dict: {
+            'engines': dict,  # engine -> page count
+            'seconds': dict,  # engine -> total extraction seconds
+            'slowest_pages': list  # [{'page', 'engine', 'seconds'}, ...]
+        }
+    """
+    engines = {}
+    seconds = {}
+    for entry in index:
+        engine = entry.get('engine', 'unknown')
+        engines[engine] = engines.get(engine, 0) + 1
+        seconds[engine] = seconds.get(engine, 0.0) + entry.get('seconds', 0.0)
+    slowest = sorted(index, key=lambda entry: entry.get('seconds', 0.0), reverse=True)[:SLOWEST_PAGES_REPORTED]
+    return {
+        'engines': engines,
+        'seconds': {engine: round(total, 4) for engine, total in seconds.items()},
+        'slowest_pages': [{'page': entry['page'], 'engine': entry.get('engine'), 'seconds': round(entry.get('seconds', 0.0), 4)}
+                          for entry in slowest],
+    }
+
+def write_pages(pages, output_path):
+    """
+    Stream (page_index, text, info) tuples to output_path and write a sidecar page index.
+
+    The index (output_path + PAGE_INDEX_SUFFIX) maps each 1-based page number
+    to the byte offset and length of its text in the UTF-8 output file, along
+    with the engine that produced it and how long that took.
+
+    Returns:
+        dict: {'pages': int, 'chars': int, 'bytes': int, 'empty_pages': int, 'index_path': str,
+               'engines': dict, 'seconds': dict, 'slowest_pages': list}  # see summarize_pages
+    """
+    index = []
+    offset = 0
+    chars = 0
+    empty_pages = 0
+    with open(output_path, "wb") as f:
+        for page_index, text, info in pages:
+            data = text.encode("utf-8")
+            f.write(data)
+            entry = {'page': page_index + 1, 'offset': offset, 'length': len(data)}
+            entry.update(info)
+            index.append(entry)
+            offset += len(data)
+            chars += len(text)
+            if not text.strip():
+                empty_pages += 1
+    summary = summarize_pages(index)
+    index_path = output_path + PAGE_INDEX_SUFFIX
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(summary, page_count=len(index), pages=index), f)
+    os.replace(tmp_path, index_path)
+    return dict(summary, pages=len(index), chars=chars, bytes=offset, empty_pages=empty_pages, index_path=index_path)
+
+def read_page_text(text_path, page):
+    """Return the text of one 1-based page from an extracted text file, using its page index."""
+    with open(text_path + PAGE_INDEX_SUFFIX, "r", encoding="utf-8") as f:
+        entry = json.load(f)['pages'][page - 1]
+    with open(text_path, "rb") as f:
+        f.seek(entry['offset'])
+        return f.read(entry['length']).decode("utf-8")
+
+def extract_pdf_to_file(file_path, output_path, workers=PDF_WORKERS):
+    """
+    Extract a PDF page by page straight into output_path (see write_pages).
+
+    Returns:
+        dict: write_pages stats
+    """
+    try:
+        return write_pages(iter_pdf_pages(file_path, workers), output_path)
+    except Exception as e:
+        print(f"[WARN] PyMuPDF failed: {e}")
+    # PyMuPDF couldn't open the file: fall back to pdfplumber for the whole document
+    try:
+        return write_pages(_iter_pdfplumber_pages(file_path), output_path)
+    except Exception as e:
+        print(f"[WARN] pdfplumber failed: {e}")
+        return write_pages([], output_path)
+
 def extract_text_from_pdf(file_path):
-    # Try PyMuPDF first
-    text = ""
+    """Return the whole text of a PDF (prefer extract_pdf_to_file for large documents)."""
     try:
-        doc = fitz.open(file_path)
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        if text.strip():
-            return text
+        return "".join(text for _, text, _ in iter_pdf_pages(file_path))
     except Exception as e:
         print(f"[WARN] PyMuPDF failed: {e}")
-    # Fallback to pdfplumber
     try:
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-        if text.strip():
-            return text
+        return "".join(text for _, text, _ in _iter_pdfplumber_pages(file_path))
     except Exception as e:
         print(f"[WARN] pdfplumber failed: {e}")
-    return text
+    return ""
 
 def extract_text_from_docx(file_path):
     text = ""
@@ -36,11 +214,192 @@ def extract_text_from_docx(file_path):
         print(f"[WARN] python-docx failed: {e}")
     return text
 
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+DOCX_BODY_XML = "word/document.xml"
+
+def iter_docx_lines(file_path):
+    """
+    Stream the text of a .docx in document order without building an object model.
+
+    word/document.xml is iterparsed straight out of the zip. Each finished
+    top-level block and each finished table row is dropped from the tree, so
+    memory stays bounded by the largest single paragraph or table row.
+    Paragraphs yield one line each; table rows yield their cells joined by tabs
+    (a nested table's rows become lines of the enclosing cell). Paragraphs
+    nested inside another paragraph (text boxes) follow it as their own lines.
+    Word stores text boxes twice, as DrawingML in mc:Choice and as VML in
+    mc:Fallback; everything under mc:Fallback is skipped so each box is read once.
+
+    Yields:
+        tuple: ('paragraph' | 'row', str)
+    """
+    import zipfile
+    import xml.etree.ElementTree as ET
+    open_elems = []  # path from the root to the element being parsed
+    paragraphs = []  # stack of {'runs': [str], 'nested': [lines]} for open paragraphs
+    tables = []  # stack of {'row': [cells], 'cell': [lines]} for nested tables
+    body = None
+    fallback_depth = 0  # > 0 while inside mc:Fallback
+    with zipfile.ZipFile(file_path) as zf, zf.open(DOCX_BODY_XML) as xml_file:
+        for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                open_elems.append(elem)
+                if fallback_depth or tag == MC_FALLBACK:
+                    fallback_depth += 1
+                elif tag == WORD_NS + "p":
+                    paragraphs.append({'runs': [], 'nested': []})
+                elif tag == WORD_NS + "tbl":
+                    tables.append({'row': None, 'cell': None})
+                elif tag == WORD_NS + "tr" and tables:
+                    tables[-1]['row'] = []
+                elif tag == WORD_NS + "tc" and tables:
+                    tables[-1]['cell'] = []
+                elif tag == WORD_NS + "body":
+                    body = elem
+                continue
+            open_elems.pop()
+            parent = open_elems[-1] if open_elems else None
+            if fallback_depth:
+                fallback_depth -= 1
+            elif tag == WORD_NS + "t" and paragraphs:
+                paragraphs[-1]['runs'].append(elem.text or "")
+            elif tag == WORD_NS + "tab" and paragraphs:
+                paragraphs[-1]['runs'].append("\t")
+            elif tag in (WORD_NS + "br", WORD_NS + "cr") and paragraphs:
+                paragraphs[-1]['runs'].append("\n")
+            elif tag == WORD_NS + "p" and paragraphs:
+                paragraph = paragraphs.pop()
+                lines = ["".join(paragraph['runs'])] + paragraph['nested']
+                if paragraphs:
+                    # Text box content inside an enclosing paragraph
+                    paragraphs[-1]['nested'].extend(lines)
+                elif tables and tables[-1]['cell'] is not None:
+                    tables[-1]['cell'].extend(lines)
+                else:
+                    for line in lines:
+                        yield 'paragraph', line
+            elif tag == WORD_NS + "tc" and tables:
+                table = tables[-1]
+                if table['row'] is not None:
+                    table['row'].append(" ".join(line for line in table['cell'] if line))
+                table['cell'] = None
+            elif tag == WORD_NS + "tr" and tables:
+                row = "\t".join(tables[-1]['row'] or [])
+                tables[-1]['row'] = None
+                if len(tables) > 1 and tables[-2]['cell'] is not None:
+                    tables[-2]['cell'].append(row)
+                elif paragraphs:
+                    paragraphs[-1]['nested'].append(row)
+                else:
+                    yield 'row', row
+                if parent is not None:
+                    # Finished rows are done with; keeps huge tables from accumulating
+                    parent.remove(elem)
+            elif tag == WORD_NS + "tbl" and tables:
+                tables.pop()
+            if body is not None and parent is body:
+                # Top-level block finished: release everything parsed so far
+                body.clear()
+
+def extract_docx_to_file(file_path, output_path):
+    """
+    Write a .docx's paragraphs and table rows to output_path as they are parsed.
+
+    Returns:
+        dict: {'paragraphs': int, 'table_rows': int, 'chars': int}
+    """
+    stats = {'paragraphs': 0, 'table_rows': 0, 'chars': 0}
+    with open(output_path, "w", encoding="utf-8") as f:
+        for kind, line in iter_docx_lines(file_path):
+            f.write(line + "\n")
+            stats['paragraphs' if kind == 'paragraph' else 'table_rows'] += 1
+            stats['chars'] += len(line) + 1
+    return stats
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in MB, or None if it can't be measured here."""
+    try:
+        import resource  # POSIX only
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # KiB on Linux, bytes on macOS
+        return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)  # peak_wset on Windows
+    except ImportError:
+        return None
+
+def _benchmark_docx_run(method, file_path):
+    """Benchmark worker: run one DOCX path in a fresh process and report its cost."""
+    import tempfile
+    start = time.perf_counter()
+    if method == "python-docx":
+        chars = len(extract_text_from_docx(file_path))
+    else:
+        # Through extract_text, the entry point the document pipeline uses
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            chars = extract_text(file_path, os.path.join(tmp_dir, "extracted.txt"))['chars']
+    return {
+        'method': method,
+        'seconds': time.perf_counter() - start,
+        'peak_rss_mb': _peak_rss_mb(),
+        'chars': chars,
+    }
+
+def benchmark_docx(file_path, methods=("python-docx", "streaming")):
+    """
+    Compare the python-docx and streaming DOCX paths on one file.
+
+    Each method runs in its own fresh process so peak RSS (which includes
+    lxml's native allocations) isn't shared between them.
+
+    Returns:
+        list: [{'method': str, 'seconds': float, 'peak_rss_mb': float or None, 'chars': int}, ...]
+    """
+    results = []
+    for method in methods:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results.append(pool.submit(_benchmark_docx_run, method, file_path).result())
+    return results
+
 def extract_text(file_path, output_path=None):
+    """
+    Extract a document's text to output_path (default: file_path + "_extracted.txt").
+
+    PDF and DOCX text is streamed to the file and never held in memory whole,
+    so the text itself isn't returned; read it from output_path.
+
+    Returns:
+        dict: {'chars': int, ...}  # plus the extract_pdf_to_file / extract_docx_to_file stats
+    """
     ext = os.path.splitext(file_path)[1].lower()
+    out_path = output_path or file_path + "_extracted.txt"
     if ext == ".pdf":
-        text = extract_text_from_pdf(file_path)
-    elif ext in (".docx", ".doc"):
+        # Pages are streamed to out_path as they are extracted
+        stats = extract_pdf_to_file(file_path, out_path)
+        if stats['empty_pages'] == stats['pages']:
+            print("[WARN] No text extracted.")
+        print(f"Extracted {stats['pages']} pages, engines {stats['engines']}, "
+              f"seconds {stats['seconds']}, text saved to {out_path}")
+        return stats
+    elif ext == ".docx":
+        # Streamed to out_path with bounded memory; includes table rows
+        try:
+            stats = extract_docx_to_file(file_path, out_path)
+        except Exception as e:
+            print(f"[WARN] Streaming DOCX extraction failed: {e}")
+            stats = {'chars': 0}
+            open(out_path, "w", encoding="utf-8").close()
+        if not stats['chars']:
+            print("[WARN] No text extracted.")
+        print(f"Extracted text saved to {out_path}")
+        return stats
+    elif ext == ".doc":
         text = extract_text_from_docx(file_path)
     elif ext == ".txt":
         # Handle plain text files for testing
@@ -50,17 +409,22 @@ def extract_text(file_path, output_path=None):
         raise ValueError(f"Unsupported file type: {ext}")
     if not text.strip():
         print("[WARN] No text extracted.")
-    out_path = output_path or file_path + "_extracted.txt"
     with open(out_path, "w", encoding="utf-8") as f:
         f.write(text)
     print(f"Extracted text saved to {out_path}")
-    return text
+    return {'chars': len(text)}
 
 if __name__ == "__main__":
     import sys
     if len(sys.argv) < 2:
         print("Usage: python extract_text_from_document.py <file_path> [output_path]")
+        print("       python extract_text_from_document.py --benchmark-docx <file.docx>")
         exit(1)
+    if sys.argv[1] == "--benchmark-docx":
+        for result in benchmark_docx(sys.argv[2]):
+            peak = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else "n/a (install psutil)"
+            print(f"{result['method']:>12}: {result['seconds']:.2f}s, peak RSS {peak}, {result['chars']} chars")
+        exit(0)
     file_path = sys.argv[1]
     output_path = sys.argv[2] if len(sys.argv) > 2 else None
     try:
@@ -0,0 +1,112 @@
+"""
+Streaming storage for screenshot metadata produced by extract_diagram_frames.py.
+
+Entries are appended to frame_metadata.jsonl (one JSON object per line) as
+frames are kept, and consolidated into frame_metadata.json once extraction
+finishes. Readers go through load_frame_metadata, which accepts either file so
+a partially written run is still usable after a crash.
+"""
+
+import os
+import json
+import threading
+
+METADATA_FILENAME = "frame_metadata.json"
+STREAM_FILENAME = "frame_metadata.jsonl"
+
+
+class FrameMetadataWriter:
+    """Append-only metadata sink: O(1) I/O per kept frame.
+
+    Starting a writer begins a new run in output_dir: the stream is truncated
+    and a frame_metadata.json from an earlier run is removed, so a crash
+    leaves only this run's entries behind.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.stream_path = os.path.join(output_dir, STREAM_FILENAME)
+        self.metadata_path = os.path.join(output_dir, METADATA_FILENAME)
+        self.count = 0
+        self._lock = threading.Lock()  # writer threads may append concurrently
+        if os.path.exists(self.metadata_path):
+            os.remove(self.metadata_path)
+        self._file = open(self.stream_path, "w", encoding="utf-8")
+
+    def append(self, metadata):
+        line = json.dumps(metadata) + "\n"
+        with self._lock:
+            self._file.write(line)
+            # Flush each line so everything written so far survives a crash
+            self._file.flush()
+            self.count += 1
+
+    def close(self, consolidate=True):
+        """Close the stream and, by default, write the consolidated JSON array."""
+        if self._file.closed:
+            return
+        self._file.close()
+        if consolidate:
+            consolidate_frame_metadata(self.output_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Leave the .jsonl in place on failure; readers will pick it up
+        self.close(consolidate=exc_type is None)
+        return False
+
+
+def read_frame_metadata_stream(stream_path):
+    """Read a JSON Lines metadata file, skipping a truncated trailing line."""
+    entries = []
+    with open(stream_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Partial line from an interrupted write
+                continue
+    return entries
+
+
+def consolidate_frame_metadata(output_dir):
+    """Merge frame_metadata.jsonl into frame_metadata.json and remove the stream file."""
+    stream_path = os.path.join(output_dir, STREAM_FILENAME)
+    metadata_path = os.path.join(output_dir, METADATA_FILENAME)
+    if not os.path.exists(stream_path):
+        return load_frame_metadata(output_dir)
+
+    all_metadata = read_frame_metadata_stream(stream_path)
+    all_metadata.sort(key=lambda x: x.get('timestamp', 0))
+    tmp_path = metadata_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(all_metadata, f, indent=2)
+    os.replace(tmp_path, metadata_path)
+    os.remove(stream_path)
+    return all_metadata
+
+
+def load_frame_metadata(screenshots_dir):
+    """Load screenshot metadata from a screenshots directory.
+
+    Prefers the consolidated frame_metadata.json and falls back to the
+    frame_metadata.jsonl stream left behind by an unfinished run. Returns
+    None when neither exists.
+    """
+    if not screenshots_dir or not os.path.exists(screenshots_dir):
+        return None
+    metadata_path = os.path.join(screenshots_dir, METADATA_FILENAME)
+    stream_path = os.path.join(screenshots_dir, STREAM_FILENAME)
+    if os.path.exists(metadata_path):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    if os.path.exists(stream_path):
+        entries = read_frame_metadata_stream(stream_path)
+        entries.sort(key=lambda x: x.get('timestamp', 0))
+        return entries
+    return None
@@ -1,11 +1,22 @@
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 from dotenv import load_dotenv
+from frame_metadata import load_frame_metadata
+from text_chunking import chunk_text, chunk_segments, chunk_pages, chunk_label, format_timestamp
 
 # Load environment variables
 load_dotenv()
 
+# Chunked (map-reduce) note generation for inputs too long for one prompt
+NOTES_MODE = os.getenv("NOTES_MODE", "auto")  # auto | single | chunked
+NOTES_CHUNK_CHARS = int(os.getenv("NOTES_CHUNK_CHARS", "60000"))  # ~15k tokens
+NOTES_MAX_CHUNKS = int(os.getenv("NOTES_MAX_CHUNKS", "16"))  # fan-out; chunks grow to stay under it
+NOTES_CONCURRENCY = int(os.getenv("NOTES_CONCURRENCY", "4"))  # parallel generate_content calls
+CHUNK_SCREENSHOTS = 8  # screenshots offered per chunk prompt
+
 def load_api_key():
     # Try both environment variable names
     api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
@@ -262,6 +273,147 @@ def generate_notes_gemini(prompt, api_key, model_name="models/gemini-2.5-flash")
     response = model.generate_content(prompt)
     return response.text
 
+def use_chunked_mode(text, mode=NOTES_MODE, chunk_chars=NOTES_CHUNK_CHARS):
+    if mode == "chunked":
+        return True
+    return mode == "auto" and len(text) > chunk_chars
+
+def plan_chunks(text, segments=None, text_path=None, chunk_chars=NOTES_CHUNK_CHARS, max_chunks=NOTES_MAX_CHUNKS):
+    """
+    Split text on the best available boundaries: subtitle/segment times, then
+    document pages, then sections and paragraphs.
+
+    Returns:
+        tuple: (chunks, kind) where kind is 'time', 'pages' or 'text' (see text_chunking)
+    """
+    chunk_chars = max(chunk_chars, -(-len(text) // max(1, max_chunks)))
+    while True:
+        chunks, kind = None, "text"
+        if segments:
+            chunks, kind = chunk_segments(segments, chunk_chars), "time"
+        elif text_path:
+            chunks, kind = chunk_pages(text_path, chunk_chars), "pages"
+        if not chunks:
+            chunks, kind = chunk_text(text, chunk_chars), "text"
+        # Greedy packing can overshoot the fan-out slightly; grow the chunks until it fits
+        if len(chunks) <= max_chunks:
+            return chunks, kind
+        chunk_chars = int(chunk_chars * 1.25)
+
+def _screenshots_for_chunk(chunk, kind, screenshot_metadata, total_chars, is_last):
+    """Screenshots taken during the chunk's time span (estimated from its text position if untimed)."""
+    if not screenshot_metadata or kind == "pages":
+        return []
+    if kind == "time":
+        start, end = chunk['start'], chunk['end']
+    else:
+        duration = max(item.get('timestamp', 0) for item in screenshot_metadata)
+        start = chunk['start'] / max(1, total_chars) * duration
+        end = chunk['end'] / max(1, total_chars) * duration
+    selected = [item for item in screenshot_metadata
+                if start <= item.get('timestamp', 0) < end or (is_last and item.get('timestamp', 0) >= end)]
+    selected.sort(key=lambda item: item.get('confidence', 0), reverse=True)
+    return sorted(selected[:CHUNK_SCREENSHOTS], key=lambda item: item.get('timestamp', 0))
+
+def build_chunk_prompt(chunk, kind, total, transcript_source="unknown", screenshots=None, job_id="unknown"):
+    """Map step: notes for one chunk only."""
+    label = chunk_label(chunk, kind)
+    material = "document" if kind == "pages" else "video transcript"
+    prompt = f"""You are an expert note-taker. Below is part {chunk['index'] + 1} of {total} ({label}) of a long {material}.
+
+Write detailed, well-structured markdown notes for THIS PART ONLY. Keep every concept, definition, example and number; do not add an introduction or conclusion for the whole {material} - the parts will be merged afterwards.
+
+**Transcript Source**: {transcript_source.replace('_', ' ').title()}
+"""
+    if screenshots:
+        prompt += f"""
+**Screenshots from this part** - insert the relevant ones where their content is discussed, using this EXACT format:
+![Description](http://localhost:8000/ai_screenshots/{job_id}/filename.jpg)
+
+"""
+        for item in screenshots:
+            prompt += (f"- {item.get('filename', '')}: {item.get('prompt_matched', 'content')} at "
+                       f"{format_timestamp(item.get('timestamp', 0))} (confidence: {item.get('confidence', 0):.2f})\n")
+    prompt += f"""
+**Content ({label})**:
+{chunk['text']}
+
+Generate the notes for this part below:
+"""
+    return prompt
+
+def build_reduce_prompt(part_notes, labels, transcript_source="unknown"):
+    """Reduce step: merge the per-chunk notes into one document."""
+    prompt = f"""You are an expert note-taker. The notes below were written separately for {len(part_notes)} consecutive parts of the same content, in order.
+
+Merge them into ONE coherent set of markdown notes:
+1. Start with a short overview of the whole content
+2. Organize logical sections and subsections across part boundaries, merging topics that continue from one part to the next
+3. Remove repetition, but keep every concept, definition, example and number
+4. Keep every screenshot image link exactly as written, next to the content it illustrates
+5. End with a summary of key takeaways
+
+**Transcript Source**: {transcript_source.replace('_', ' ').title()}
+
+"""
+    for notes, label in zip(part_notes, labels):
+        prompt += f"--- Notes for {label} ---\n{notes}\n\n"
+    prompt += "Generate the merged notes below:\n"
+    return prompt
+
+def generate_notes_mapreduce(chunks, kind, api_key, transcript_source="unknown", screenshot_metadata=None,
+                             job_id="unknown", concurrency=NOTES_CONCURRENCY, stats=None):
+    """
+    Generate notes per chunk concurrently (at most `concurrency` requests in
+    flight), then merge them with one reduce call.
+
+    Args:
+        stats (dict): Optional; filled with {
+            'mode': 'chunked', 'boundary': str, 'concurrency': int,
+            'chunks': [{'index', 'label', 'chars', 'seconds'}, ...],
+            'map_seconds': float, 'reduce_seconds': float
+        }
+    """
+    total_chars = chunks[-1]['end'] if kind == "text" else 0
+    labels = [chunk_label(chunk, kind) for chunk in chunks]
+    prompts = [
+        build_chunk_prompt(chunk, kind, len(chunks), transcript_source,
+                           _screenshots_for_chunk(chunk, kind, screenshot_metadata, total_chars, i == len(chunks) - 1),
+                           job_id)
+        for i, chunk in enumerate(chunks)
+    ]
+
+    def run_chunk(i):
+        start = time.perf_counter()
+        notes = generate_notes_gemini(prompts[i], api_key)
+        seconds = time.perf_counter() - start
+        print(f"Notes for chunk {i + 1}/{len(chunks)} ({labels[i]}, {len(chunks[i]['text'])} chars) in {seconds:.1f}s")
+        return notes, seconds
+
+    workers = max(1, min(concurrency, len(chunks)))
+    map_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_chunk, range(len(chunks))))
+    map_seconds = time.perf_counter() - map_start
+
+    reduce_start = time.perf_counter()
+    notes = generate_notes_gemini(build_reduce_prompt([r[0] for r in results], labels, transcript_source), api_key)
+    reduce_seconds = time.perf_counter() - reduce_start
+    print(f"Chunked notes: {len(chunks)} chunks in {map_seconds:.1f}s (concurrency {workers}), "
+          f"reduce in {reduce_seconds:.1f}s")
+
+    if stats is not None:
+        stats.update({
+            'mode': 'chunked',
+            'boundary': kind,
+            'concurrency': workers,
+            'chunks': [{'index': chunk['index'], 'label': label, 'chars': len(chunk['text']), 'seconds': seconds}
+                       for chunk, label, (_, seconds) in zip(chunks, labels, results)],
+            'map_seconds': map_seconds,
+            'reduce_seconds': reduce_seconds,
+        })
+    return notes
+
 def enhance_notes_with_screenshots(notes, screenshot_metadata, screenshots_dir):
     """
     Post-process the generated notes to ensure screenshot references are properly formatted
@@ -316,8 +468,14 @@ def enhance_notes_with_screenshots(notes, screenshot_metadata, screenshots_dir):
     
     return notes
 
-def generate_notes_from_transcript(transcript_content, alignment_path=None, screenshots_dir=None, transcript_source="unknown", subtitle_info=None):
-    """Generate notes from transcript content with time-synchronized screenshot integration"""
+def generate_notes_from_transcript(transcript_content, alignment_path=None, screenshots_dir=None, transcript_source="unknown", subtitle_info=None,
+                                   segments=None, stats=None):
+    """
+    Generate notes from transcript content with time-synchronized screenshot integration.
+
+    Long transcripts are split (on segment times when `segments` are given)
+    and generated map-reduce style; `stats` receives the per-chunk latencies.
+    """
     api_key = load_api_key()
     
     # Load alignment if available
@@ -331,13 +489,16 @@ def generate_notes_from_transcript(transcript_content, alignment_path=None, scre
     job_id = "unknown"
     if screenshots_dir and os.path.exists(screenshots_dir):
         job_id = os.path.basename(screenshots_dir)
-        metadata_file = os.path.join(screenshots_dir, "frame_metadata.json")
-        if os.path.exists(metadata_file):
-            try:
-                with open(metadata_file, "r", encoding="utf-8") as f:
-                    screenshot_metadata = json.load(f)
-            except Exception as e:
-                print(f"Warning: Could not load screenshot metadata: {e}")
+        try:
+            screenshot_metadata = load_frame_metadata(screenshots_dir)
+        except Exception as e:
+            print(f"Warning: Could not load screenshot metadata: {e}")
+    
+    if use_chunked_mode(transcript_content):
+        chunks, kind = plan_chunks(transcript_content, segments=segments)
+        if len(chunks) > 1:
+            return generate_notes_mapreduce(chunks, kind, api_key, transcript_source, screenshot_metadata, job_id,
+                                            stats=stats)
     
     # Use time-synchronized note generation if we have screenshots
     if screenshot_metadata:
@@ -358,20 +519,30 @@ def generate_notes_from_transcript(transcript_content, alignment_path=None, scre
     # No need for post-processing since screenshots are now embedded naturally
     return notes
 
-def main(transcript_path, output_path, alignment_path=None, doc_text_path=None, transcript_source="unknown", screenshots_dir=None):
+def main(transcript_path, output_path, alignment_path=None, doc_text_path=None, transcript_source="unknown", screenshots_dir=None,
+         stats=None):
     api_key = load_api_key()
     transcript, alignment, doc_text = load_inputs(transcript_path, alignment_path, doc_text_path)
     
     # Load screenshot metadata if available
     screenshot_metadata = None
     if screenshots_dir and os.path.exists(screenshots_dir):
-        metadata_file = os.path.join(screenshots_dir, "frame_metadata.json")
-        if os.path.exists(metadata_file):
-            try:
-                with open(metadata_file, "r", encoding="utf-8") as f:
-                    screenshot_metadata = json.load(f)
-            except Exception as e:
-                print(f"Warning: Could not load screenshot metadata: {e}")
+        try:
+            screenshot_metadata = load_frame_metadata(screenshots_dir)
+        except Exception as e:
+            print(f"Warning: Could not load screenshot metadata: {e}")
+    
+    # Long inputs: split on pages (extracted documents have a page index) or sections
+    if not doc_text and use_chunked_mode(transcript):
+        chunks, kind = plan_chunks(transcript, text_path=transcript_path)
+        if len(chunks) > 1:
+            job_id = os.path.basename(screenshots_dir) if screenshots_dir else "unknown"
+            notes = generate_notes_mapreduce(chunks, kind, api_key, transcript_source, screenshot_metadata, job_id,
+                                             stats=stats)
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(notes)
+            print(f"Generated notes saved to {output_path}")
+            return
     
     prompt = build_prompt(transcript, alignment, doc_text, transcript_source, None, screenshot_metadata)
     notes = generate_notes_gemini(prompt, api_key)
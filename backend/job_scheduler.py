@@ -0,0 +1,109 @@
+"""
+Bounded job scheduler for video processing.
+
+A fixed pool of worker threads drains a priority queue (lower priority value
+runs first, FIFO within a priority). Submissions beyond the queue capacity are
+rejected so callers can apply backpressure. Per-stage semaphores cap how many
+CLIP and Whisper branches run at once across all jobs.
+"""
+
+import os
+import heapq
+import itertools
+import threading
+
+VIDEO_JOB_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "2"))
+MAX_QUEUED_VIDEO_JOBS = int(os.getenv("MAX_QUEUED_VIDEO_JOBS", "20"))
+STAGE_LIMITS = {
+    'screenshots': int(os.getenv("CLIP_STAGE_CONCURRENCY", "1")),
+    'transcript': int(os.getenv("WHISPER_STAGE_CONCURRENCY", "1")),
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobScheduler:
+    def __init__(self, workers=VIDEO_JOB_WORKERS, max_queued=MAX_QUEUED_VIDEO_JOBS, name="video-job"):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.name = name
+        self._heap = []  # (priority, seq, job_id, fn)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = set()
+        self._threads = []
+
+    def _ensure_workers(self):
+        # Started lazily so importing the module doesn't spawn threads
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def is_full(self):
+        with self._cond:
+            return len(self._heap) >= self.max_queued
+
+    def submit(self, job_id, fn, priority=0):
+        """Queue fn() to run on a worker. Returns the 1-based queue position; raises QueueFull."""
+        with self._cond:
+            if len(self._heap) >= self.max_queued:
+                raise QueueFull(f"{len(self._heap)} jobs already queued")
+            self._ensure_workers()
+            heapq.heappush(self._heap, (priority, next(self._seq), job_id, fn))
+            self._cond.notify()
+            return self._position_locked(job_id)
+
+    def _position_locked(self, job_id):
+        for position, entry in enumerate(sorted(self._heap), start=1):
+            if entry[2] == job_id:
+                return position
+        return None
+
+    def position(self, job_id):
+        """1-based position in the queue, 0 if running, None if unknown or finished."""
+        with self._cond:
+            if job_id in self._running:
+                return 0
+            return self._position_locked(job_id)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'running': len(self._running),
+                'queued': len(self._heap),
+                'max_queued': self.max_queued,
+            }
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job_id, fn = heapq.heappop(self._heap)
+                self._running.add(job_id)
+            try:
+                fn()
+            except Exception as e:
+                print(f"Job {job_id} crashed: {e}")
+            finally:
+                with self._cond:
+                    self._running.discard(job_id)
+
+
+# Per-stage concurrency across all jobs
+_STAGE_SEMAPHORES = {stage: threading.BoundedSemaphore(max(1, limit)) for stage, limit in STAGE_LIMITS.items()}
+
+
+def acquire_stage(stage):
+    _STAGE_SEMAPHORES[stage].acquire()
+
+
+def release_stage(stage):
+    _STAGE_SEMAPHORES[stage].release()
+
+
+VIDEO_SCHEDULER = JobScheduler()
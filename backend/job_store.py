@@ -0,0 +1,235 @@
+"""
+Durable job status and progress store.
+
+Progress updates come from pipeline threads and must stay cheap, so writes
+only touch an in-process cache and mark the job dirty. A background task on
+the API event loop flushes dirty jobs to the job_records table in one
+transaction every PROGRESS_FLUSH_SECONDS, and evicts finished jobs older than
+JOB_TTL_SECONDS. Unfinished jobs that haven't been updated for JOB_TTL_SECONDS
+(orphaned by a restart or a crashed worker, or an aborted upload) are marked
+failed first, so they are evicted one TTL later like any other. Reads check this worker's cache first and then the database,
+so any uvicorn worker can answer for any job.
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from sqlalchemy import delete, select
+
+from database import job_store_engine, JobStoreSession, JobStoreBase
+from models import JobRecord
+from progress_events import PROGRESS_HUB
+
+PROGRESS_FLUSH_SECONDS = float(os.getenv("PROGRESS_FLUSH_SECONDS", "0.5"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+LOCAL_RETENTION_SECONDS = 60  # keep finished, flushed jobs in memory this long
+EVICT_INTERVAL_SECONDS = 300
+
+FINISHED_STATUSES = ("completed", "failed")
+FINISHED_STAGES = ("completed", "error")
+ABANDONED_MESSAGE = "Job stopped reporting progress and was marked failed"
+
+
+class JobStore:
+    def __init__(self, kind):
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._local = {}  # id -> {'status': dict|None, 'progress': dict|None, 'updated_at': float}
+        self._dirty = set()
+        self._deleted = set()
+
+    def _entry(self, job_id):
+        entry = self._local.get(job_id)
+        if entry is None:
+            entry = self._local[job_id] = {'status': None, 'progress': None, 'updated_at': time.time()}
+        self._deleted.discard(job_id)
+        return entry
+
+    def set_status(self, job_id, status):
+        """Record a JobStatus (model or dict) for job_id."""
+        if hasattr(status, "dict"):
+            status = status.dict()
+        with self._lock:
+            entry = self._entry(job_id)
+            entry['status'] = status
+            entry['updated_at'] = time.time()
+            self._dirty.add(job_id)
+
+    def set_progress(self, job_id, progress):
+        with self._lock:
+            entry = self._entry(job_id)
+            entry['progress'] = dict(progress)
+            entry['updated_at'] = time.time()
+            self._dirty.add(job_id)
+            progress = entry['progress']
+        PROGRESS_HUB.publish((self.kind, job_id), progress)
+
+    def update_progress(self, job_id, **fields):
+        """Merge extra fields into the current progress dict."""
+        with self._lock:
+            entry = self._entry(job_id)
+            entry['progress'] = dict(entry['progress'] or {}, **fields)
+            entry['updated_at'] = time.time()
+            self._dirty.add(job_id)
+            progress = entry['progress']
+        PROGRESS_HUB.publish((self.kind, job_id), progress)
+
+    def is_local(self, job_id):
+        """True if this worker holds the job, i.e. its progress updates are published here."""
+        with self._lock:
+            return job_id in self._local
+
+    def delete(self, job_id):
+        with self._lock:
+            self._local.pop(job_id, None)
+            self._dirty.discard(job_id)
+            self._deleted.add(job_id)
+
+    async def get(self, job_id):
+        """Return {'status': dict|None, 'progress': dict|None} or None if the job is unknown."""
+        with self._lock:
+            entry = self._local.get(job_id)
+            if entry is not None:
+                return {'status': entry['status'], 'progress': entry['progress']}
+        async with JobStoreSession() as session:
+            record = await session.get(JobRecord, job_id)
+        if record is None or record.kind != self.kind:
+            return None
+        return {
+            'status': json.loads(record.status) if record.status else None,
+            'progress': json.loads(record.progress) if record.progress else None,
+        }
+
+    @staticmethod
+    def _is_finished(entry):
+        status = entry['status'] or {}
+        progress = entry['progress'] or {}
+        return status.get('status') in FINISHED_STATUSES or progress.get('stage') in FINISHED_STAGES
+
+    @staticmethod
+    def _abandon(status, progress):
+        """Failed status and progress for a job that stopped reporting. Returns (status, progress)."""
+        if status is not None:
+            status = dict(status, status="failed", message=ABANDONED_MESSAGE)
+        progress = dict(progress or {'progress': 0}, stage="error", message=ABANDONED_MESSAGE)
+        return status, progress
+
+    async def flush(self):
+        """Write all dirty jobs in one transaction. Returns the number of rows written."""
+        with self._lock:
+            snapshot = {job_id: dict(self._local[job_id]) for job_id in self._dirty if job_id in self._local}
+            deleted = set(self._deleted)
+            self._dirty.clear()
+            self._deleted.clear()
+        if not snapshot and not deleted:
+            return 0
+        try:
+            async with JobStoreSession() as session:
+                async with session.begin():
+                    for job_id, entry in snapshot.items():
+                        await session.merge(JobRecord(
+                            id=job_id,
+                            kind=self.kind,
+                            status=json.dumps(entry['status']) if entry['status'] is not None else None,
+                            progress=json.dumps(entry['progress']) if entry['progress'] is not None else None,
+                            finished=self._is_finished(entry),
+                            updated_at=entry['updated_at'],
+                        ))
+                    if deleted:
+                        await session.execute(delete(JobRecord).where(JobRecord.id.in_(deleted)))
+        except Exception:
+            # Put the batch back so the next flush retries it
+            with self._lock:
+                self._dirty.update(job_id for job_id in snapshot if job_id in self._local)
+                self._deleted.update(deleted)
+            raise
+        return len(snapshot) + len(deleted)
+
+    def evict_local(self, ttl=JOB_TTL_SECONDS):
+        """
+        Drop finished jobs that are already persisted from this worker's memory.
+
+        Unfinished jobs not updated within ttl seconds are marked failed instead;
+        the next flush persists that and a later call drops them.
+        """
+        now = time.time()
+        abandoned = []
+        with self._lock:
+            for job_id, entry in list(self._local.items()):
+                if self._is_finished(entry):
+                    if job_id not in self._dirty and entry['updated_at'] < now - LOCAL_RETENTION_SECONDS:
+                        del self._local[job_id]
+                elif entry['updated_at'] < now - ttl:
+                    entry['status'], entry['progress'] = self._abandon(entry['status'], entry['progress'])
+                    entry['updated_at'] = now
+                    self._dirty.add(job_id)
+                    abandoned.append((job_id, entry['progress']))
+        for job_id, progress in abandoned:
+            PROGRESS_HUB.publish((self.kind, job_id), progress)
+
+    async def evict_expired(self, ttl=JOB_TTL_SECONDS):
+        """Mark unfinished jobs not updated within ttl seconds failed, and delete finished ones."""
+        now = time.time()
+        async with JobStoreSession() as session:
+            async with session.begin():
+                stale = await session.execute(
+                    select(JobRecord)
+                    .where(JobRecord.kind == self.kind)
+                    .where(JobRecord.finished.is_(False))
+                    .where(JobRecord.updated_at < now - ttl)
+                )
+                with self._lock:
+                    local = set(self._local)
+                for record in stale.scalars():
+                    if record.id in local:
+                        continue  # evict_local handles this worker's jobs
+                    status, progress = self._abandon(
+                        json.loads(record.status) if record.status else None,
+                        json.loads(record.progress) if record.progress else None,
+                    )
+                    record.status = json.dumps(status) if status is not None else None
+                    record.progress = json.dumps(progress)
+                    record.finished = True
+                    record.updated_at = now
+                result = await session.execute(
+                    delete(JobRecord)
+                    .where(JobRecord.kind == self.kind)
+                    .where(JobRecord.finished.is_(True))
+                    .where(JobRecord.updated_at < now - ttl)
+                )
+        return result.rowcount
+
+
+VIDEO_JOBS = JobStore("video")
+DOCUMENT_JOBS = JobStore("document")
+STORES = (VIDEO_JOBS, DOCUMENT_JOBS)
+
+
+async def init_job_store():
+    async with job_store_engine.begin() as conn:
+        await conn.run_sync(JobStoreBase.metadata.create_all)
+
+
+async def flush_all():
+    for store in STORES:
+        await store.flush()
+
+
+async def run_flusher(interval=PROGRESS_FLUSH_SECONDS):
+    """Background task: batch progress writes and periodically evict expired jobs."""
+    last_evict = 0.0
+    while True:
+        try:
+            await flush_all()
+            if time.monotonic() - last_evict > EVICT_INTERVAL_SECONDS:
+                for store in STORES:
+                    store.evict_local()
+                    await store.evict_expired()
+                last_evict = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Job store flush failed: {e}")
+        await asyncio.sleep(interval)
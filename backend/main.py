@@ -1,4 +1,6 @@
 
+import os
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -29,6 +31,60 @@ app.include_router(settings_router)
 # Mount static files for screenshots
 app.mount("/ai_screenshots", StaticFiles(directory="ai_screenshots"), name="ai_screenshots")
 
+# CLIP and Whisper live in the video branch workers; start those (and, with
+# PRELOAD_MODELS, load the models there) in the background at startup
+@app.on_event("startup")
+async def warm_branch_workers():
+    from video_pipeline import PRELOAD_MODELS, warm_branch_pool
+    if not PRELOAD_MODELS:
+        return
+
+    def warm():
+        try:
+            warm_branch_pool()
+        except Exception as e:
+            print(f"Video branch worker warm-up skipped: {e}")
+
+    asyncio.get_running_loop().run_in_executor(None, warm)
+
+@app.get("/models/stats")
+def model_stats():
+    from video_pipeline import get_branch_model_stats
+    return {"branch_workers": get_branch_model_stats()}
+
+# Spawn the document workers (and their fitz/pdfplumber/Gemini imports) in the
+# background so the first upload doesn't pay for it
+WARM_DOCUMENT_WORKERS = os.getenv("WARM_DOCUMENT_WORKERS", "true").lower() in ("1", "true", "yes")
+
+@app.on_event("startup")
+async def warm_document_workers():
+    if not WARM_DOCUMENT_WORKERS:
+        return
+    from document_pipeline import warm_document_pool
+
+    def warm():
+        try:
+            warm_document_pool()
+        except Exception as e:
+            print(f"Document worker warm-up skipped: {e}")
+
+    asyncio.get_running_loop().run_in_executor(None, warm)
+
+# Shared job store: create the table, then batch progress writes in the background
+@app.on_event("startup")
+async def start_job_store():
+    from job_store import init_job_store, run_flusher
+    await init_job_store()
+    app.state.job_store_flusher = asyncio.create_task(run_flusher())
+
+@app.on_event("shutdown")
+async def stop_job_store():
+    from job_store import flush_all
+    flusher = getattr(app.state, "job_store_flusher", None)
+    if flusher:
+        flusher.cancel()
+    await flush_all()
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -0,0 +1,89 @@
+"""
+Media preparation for video jobs.
+Demuxes the audio track once into a compact 16 kHz mono PCM WAV that Whisper
+and any other audio consumers read instead of the full video container.
+"""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_FILENAME = "audio.wav"
+
+
+def find_ffmpeg():
+    """Locate ffmpeg: a local ffmpeg.exe (see install_ffmpeg.py) or one on PATH."""
+    if Path("ffmpeg.exe").exists():
+        return str(Path("ffmpeg.exe").resolve())
+    return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def find_ffprobe():
+    """Locate ffprobe next to a local ffmpeg.exe, or on PATH."""
+    if Path("ffprobe.exe").exists():
+        return str(Path("ffprobe.exe").resolve())
+    return shutil.which("ffprobe") or "ffprobe"
+
+
+def probe_keyframe_interval(video_path, probe_seconds=120):
+    """
+    Median spacing between video keyframes, in seconds, over the first probe_seconds.
+
+    Only keyframes are decoded (-skip_frame nokey), so this is quick. Returns
+    None when ffprobe is unavailable or finds fewer than two keyframes.
+    """
+    cmd = [
+        find_ffprobe(), "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+        "-read_intervals", f"%+{probe_seconds}", "-show_entries", "frame=pts_time",
+        "-of", "csv=p=0", str(video_path),
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Keyframe probe failed: {e}")
+        return None
+    times = sorted(float(line.split(",")[0]) for line in result.stdout.split()
+                   if line and line.split(",")[0] not in ("", "N/A"))
+    gaps = sorted(b - a for a, b in zip(times, times[1:]) if b > a)
+    if not gaps:
+        return None
+    return gaps[len(gaps) // 2]
+
+
+def extract_audio_track(video_path, output_dir):
+    """
+    Extract the audio track of a video into output_dir/audio.wav (16 kHz mono s16le).
+
+    The artifact is cached: if it already exists it is returned as-is, so a
+    re-run of the same job never demuxes twice.
+
+    Returns:
+        dict: {
+            'audio_path': str,
+            'cached': bool,
+            'size': int  # bytes
+        }
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    audio_path = os.path.join(output_dir, AUDIO_FILENAME)
+    if os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
+        return {'audio_path': audio_path, 'cached': True, 'size': os.path.getsize(audio_path)}
+
+    # Write to a temporary name first so an interrupted demux is never mistaken for a cached artifact
+    tmp_path = audio_path + ".part.wav"
+    cmd = [
+        find_ffmpeg(), "-nostdin", "-y", "-loglevel", "error",
+        "-i", str(video_path),
+        "-vn", "-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE), "-c:a", "pcm_s16le",
+        tmp_path,
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(f"Audio extraction failed: {e.stderr or e.stdout or str(e)}")
+    os.replace(tmp_path, audio_path)
+    return {'audio_path': audio_path, 'cached': False, 'size': os.path.getsize(audio_path)}
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Integer, DateTime, Text
+from sqlalchemy import Column, String, Integer, DateTime, Text, Float, Boolean
 from sqlalchemy.sql import func
-from database import Base
+from database import Base, JobStoreBase
 
 class Note(Base):
     __tablename__ = "notes"
@@ -22,3 +22,12 @@ class Document(Base):
     size = Column(Integer)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String)
+
+class JobRecord(JobStoreBase):
+    __tablename__ = "job_records"
+    id = Column(String, primary_key=True, index=True)
+    kind = Column(String, nullable=False, index=True)  # "video" or "document"
+    status = Column(Text)  # JSON-encoded JobStatus
+    progress = Column(Text)  # JSON-encoded progress dict
+    finished = Column(Boolean, default=False, index=True)
+    updated_at = Column(Float, nullable=False, index=True)  # unix time
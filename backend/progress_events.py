@@ -0,0 +1,140 @@
+"""
+Push-based progress streaming.
+
+update_video_progress / update_progress publish every change to an in-process
+hub; each Server-Sent Events subscriber is an idle coroutine waiting on a
+one-slot queue, so thousands of open streams cost one asyncio task each and no
+requests. Publishing is thread-safe (pipeline code runs on worker threads) and
+coalescing: a slow subscriber only ever sees the latest state.
+
+Jobs processed by another API worker never publish here. For those, one
+shared poller task per job reads the shared job store every SSE_POLL_SECONDS
+and publishes changes to the hub, so a job costs one read per interval no
+matter how many clients are watching it on this worker.
+"""
+
+import os
+import json
+import asyncio
+import threading
+
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", "2"))
+TERMINAL_STAGES = ("completed", "error")
+
+
+class ProgressHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # key -> set of asyncio.Queue
+        self._loop = None
+        self._pollers = {}  # key -> asyncio.Task; only touched on the event loop
+
+    def subscribe(self, key):
+        """Register a subscriber for key on the running event loop. Returns its queue."""
+        queue = asyncio.Queue(maxsize=1)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.setdefault(key, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, key, queue):
+        with self._lock:
+            queues = self._subscribers.get(key)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[key]
+
+    def has_subscribers(self, key):
+        with self._lock:
+            return bool(self._subscribers.get(key))
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    @staticmethod
+    def _offer(queue, data):
+        # Latest state wins; drop the unread one
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(data)
+
+    def publish(self, key, data):
+        """Deliver data to every subscriber of key. Safe to call from any thread."""
+        with self._lock:
+            queues = list(self._subscribers.get(key, ()))
+            loop = self._loop
+        if not queues or loop is None or loop.is_closed():
+            return
+        data = dict(data)
+        for queue in queues:
+            loop.call_soon_threadsafe(self._offer, queue, data)
+
+    def ensure_poller(self, key, store, job_id, last):
+        """Start the shared store poller for a job owned by another worker, unless one is running."""
+        task = self._pollers.get(key)
+        if task is None or task.done():
+            self._pollers[key] = asyncio.get_running_loop().create_task(self._poll(key, store, job_id, last))
+
+    async def _poll(self, key, store, job_id, last):
+        # Runs while anyone here is watching and the job isn't finished
+        try:
+            while self.has_subscribers(key) and not store.is_local(job_id):
+                await asyncio.sleep(SSE_POLL_SECONDS)
+                try:
+                    job = await store.get(job_id)
+                except Exception as e:
+                    print(f"Progress poll for {job_id} failed: {e}")
+                    continue
+                current = (job or {}).get('progress')
+                if current and current != last:
+                    last = current
+                    self.publish(key, current)
+                    if current.get('stage') in TERMINAL_STAGES:
+                        break
+        finally:
+            if self._pollers.get(key) is asyncio.current_task():
+                del self._pollers[key]
+
+
+PROGRESS_HUB = ProgressHub()
+
+
+def _sse_event(data):
+    return f"event: progress\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_progress(store, job_id, request, default):
+    """
+    Async generator of SSE frames for one job, ending after a terminal stage.
+
+    Args:
+        store: JobStore the job's progress is recorded in
+        job_id (str): Job or document ID
+        request: Starlette request, used to stop when the client disconnects
+        default (dict): Progress reported before the job has any
+    """
+    key = (store.kind, job_id)
+    queue = PROGRESS_HUB.subscribe(key)
+    try:
+        job = await store.get(job_id)
+        last = (job or {}).get('progress') or default
+        yield _sse_event(last)
+        while last.get('stage') not in TERMINAL_STAGES:
+            # Local jobs push their updates; others are fed by the job's shared poller
+            if not store.is_local(job_id):
+                PROGRESS_HUB.ensure_poller(key, store, job_id, last)
+            try:
+                current = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            if current != last:
+                last = current
+                yield _sse_event(last)
+    finally:
+        PROGRESS_HUB.unsubscribe(key, queue)
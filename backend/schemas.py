@@ -13,6 +13,8 @@ class JobStatus(BaseModel):
     status: str  # pending, processing, completed, failed
     progress: Optional[int] = None
     message: Optional[str] = None
+    bytes_downloaded: Optional[int] = None
+    queue_position: Optional[int] = None  # 1-based while waiting for a worker
 
 
 # Note schema for notes API
@@ -0,0 +1,149 @@
+"""
+Boundary-aware splitting of long transcripts and documents for chunked note
+generation.
+
+Text is cut into units at natural boundaries (timed transcript segments,
+document pages from the extraction page index, or paragraphs and headings)
+and the units are packed greedily into chunks of at most chunk_chars. Only a
+single unit longer than chunk_chars is split further, at sentence and then
+word boundaries.
+"""
+
+import os
+import re
+import json
+
+HEADING_RE = re.compile(r"^(#{1,6} |[A-Z0-9][A-Z0-9 .:&/-]{3,80}$|\d+(\.\d+)*\.? +\S)")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def _split_oversized(text, chunk_chars):
+    """Split one unit longer than chunk_chars at sentence ends, then at spaces."""
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_END_RE.split(text):
+        while len(sentence) > chunk_chars:
+            cut = sentence.rfind(" ", 0, chunk_chars)
+            cut = cut if cut > 0 else chunk_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > chunk_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def pack_units(units, chunk_chars, separator="\n"):
+    """
+    Greedily pack units into chunks of at most chunk_chars.
+
+    Args:
+        units (list): [{'text': str, 'start': any, 'end': any, 'heading': bool}, ...];
+            'start'/'end' are carried through as the chunk's range
+        chunk_chars (int): Target maximum chunk size in characters
+        separator (str): Inserted between units of the same chunk
+
+    Returns:
+        list: [{'index': int, 'text': str, 'start': any, 'end': any}, ...]
+    """
+    chunks = []
+    current = []
+    size = 0
+
+    def close():
+        if current:
+            chunks.append({
+                'index': len(chunks),
+                'text': separator.join(unit['text'] for unit in current),
+                'start': current[0].get('start'),
+                'end': current[-1].get('end'),
+            })
+
+    for unit in units:
+        if len(unit['text']) > chunk_chars:
+            if size > chunk_chars // 4:
+                close()
+                current = []
+            # A short open chunk (e.g. a lone heading) stays with the first piece
+            for piece in _split_oversized(unit['text'], chunk_chars):
+                current.append(dict(unit, text=piece))
+                close()
+                current = []
+            size = 0
+            continue
+        added = len(unit['text']) + (len(separator) if current else 0)
+        # Start a new chunk when full, or at a heading once the chunk is half full
+        if current and (size + added > chunk_chars or (unit.get('heading') and size > chunk_chars // 2)):
+            close()
+            current, size = [], 0
+            added = len(unit['text'])
+        current.append(unit)
+        size += added
+    close()
+    return chunks
+
+
+def chunk_text(text, chunk_chars):
+    """Chunk plain text on paragraph and heading boundaries. Chunk ranges are character offsets."""
+    units = []
+    offset = 0
+    for line in text.split("\n"):
+        if line.strip():
+            units.append({'text': line, 'start': offset, 'end': offset + len(line),
+                          'heading': bool(HEADING_RE.match(line.strip()))})
+        offset += len(line) + 1
+    return pack_units(units, chunk_chars)
+
+
+def chunk_segments(segments, chunk_chars):
+    """Chunk timed transcript segments ({'start', 'end', 'text'}); chunk ranges are seconds."""
+    units = [{'text': segment['text'].strip(), 'start': segment['start'], 'end': segment['end']}
+             for segment in segments if segment.get('text', '').strip()]
+    return pack_units(units, chunk_chars, separator=" ")
+
+
+def chunk_pages(text_path, chunk_chars, index_suffix=".pages.json"):
+    """
+    Chunk an extracted document on page boundaries using its page index sidecar.
+
+    Returns:
+        list: chunks whose ranges are 1-based page numbers, or None if there is no index
+    """
+    index_path = text_path + index_suffix
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r", encoding="utf-8") as f:
+        pages = json.load(f)['pages']
+    units = []
+    with open(text_path, "rb") as f:
+        for entry in pages:
+            f.seek(entry['offset'])
+            text = f.read(entry['length']).decode("utf-8").strip()
+            if text:
+                units.append({'text': text, 'start': entry['page'], 'end': entry['page']})
+    return pack_units(units, chunk_chars, separator="\n\n")
+
+
+def chunk_label(chunk, kind):
+    """Human-readable range of a chunk: time span, page span or part number."""
+    if kind == "time":
+        return f"{format_timestamp(chunk['start'])}-{format_timestamp(chunk['end'])}"
+    if kind == "pages":
+        if chunk['start'] == chunk['end']:
+            return f"page {chunk['start']}"
+        return f"pages {chunk['start']}-{chunk['end']}"
+    return f"part {chunk['index'] + 1}"
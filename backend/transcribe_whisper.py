@@ -1,11 +1,261 @@
 import os
+import time
+import wave
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import whisper
 from tqdm import tqdm
 import json
 from pathlib import Path
 
-def transcribe_audio_whisper(audio_path, output_path=None, model_size="base"):
-    """Transcribe audio/video using Whisper with better Windows path handling"""
+# Per-process Whisper model cache keyed by model size, bounded LRU
+WHISPER_CACHE_SIZE = int(os.getenv("WHISPER_CACHE_SIZE", "2"))
+_WHISPER_LOCK = threading.Lock()
+_WHISPER_MODELS = OrderedDict()
+WHISPER_CACHE_STATS = {
+    'hits': 0,
+    'misses': 0,
+    'evictions': 0,
+    'load_seconds': 0.0,
+}
+
+
+def get_whisper_model(model_size="base"):
+    """Return a cached Whisper model, loading it on first use and evicting the least recently used."""
+    with _WHISPER_LOCK:
+        model = _WHISPER_MODELS.get(model_size)
+        if model is not None:
+            _WHISPER_MODELS.move_to_end(model_size)
+            WHISPER_CACHE_STATS['hits'] += 1
+            return model
+
+        WHISPER_CACHE_STATS['misses'] += 1
+        start = time.perf_counter()
+        model = whisper.load_model(model_size)
+        WHISPER_CACHE_STATS['load_seconds'] += time.perf_counter() - start
+        _WHISPER_MODELS[model_size] = model
+        while len(_WHISPER_MODELS) > max(1, WHISPER_CACHE_SIZE):
+            _WHISPER_MODELS.popitem(last=False)
+            WHISPER_CACHE_STATS['evictions'] += 1
+        return model
+
+
+def warm_whisper_models(model_sizes=("base",)):
+    """Load Whisper models ahead of the first job (e.g. at API startup)."""
+    for model_size in model_sizes:
+        get_whisper_model(model_size)
+    return get_whisper_cache_stats()
+
+
+def get_whisper_cache_stats():
+    with _WHISPER_LOCK:
+        stats = dict(WHISPER_CACHE_STATS)
+        stats['loaded_models'] = list(_WHISPER_MODELS.keys())
+    return stats
+
+
+# Chunked transcription for long recordings
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE  # 16 kHz
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))  # processes used for chunked transcription
+CHUNK_SECONDS = 600  # target chunk length; only recordings longer than this are split
+SILENCE_SEARCH_SECONDS = 30  # look this far either side of each target boundary for a pause
+SILENCE_WINDOW_SECONDS = 0.1  # energy window used to find the quietest cut point
+STREAM_CHUNK_SECONDS = 120  # window transcribed per step in streaming mode
+
+_CHUNK_POOL_LOCK = threading.Lock()
+_CHUNK_POOL = None
+
+
+def load_audio_array(audio_path):
+    """Decode any audio/video file to a 16 kHz mono float32 array.
+
+    16 kHz mono 16-bit WAVs (the media_prep.py artifact) are read directly
+    without launching ffmpeg; anything else goes through whisper.load_audio.
+    """
+    audio_path = str(audio_path)
+    if audio_path.lower().endswith(".wav"):
+        with wave.open(audio_path, "rb") as wav:
+            if wav.getframerate() == SAMPLE_RATE and wav.getnchannels() == 1 and wav.getsampwidth() == 2:
+                pcm = wav.readframes(wav.getnframes())
+                return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+    return whisper.load_audio(audio_path)
+
+
+def find_silence_boundaries(audio, chunk_seconds=CHUNK_SECONDS, search_seconds=SILENCE_SEARCH_SECONDS):
+    """Return sample offsets splitting audio into ~chunk_seconds chunks at the quietest nearby point."""
+    window = int(SAMPLE_RATE * SILENCE_WINDOW_SECONDS)
+    n_windows = len(audio) // window
+    if n_windows == 0:
+        return [0, len(audio)]
+    energy = np.sqrt(np.mean(audio[:n_windows * window].reshape(n_windows, window) ** 2, axis=1))
+
+    boundaries = [0]
+    chunk_windows = int(chunk_seconds / SILENCE_WINDOW_SECONDS)
+    search_windows = int(search_seconds / SILENCE_WINDOW_SECONDS)
+    target = chunk_windows
+    while target < n_windows - search_windows:
+        lo = max(boundaries[-1] // window + 1, target - search_windows)
+        hi = min(n_windows, target + search_windows)
+        cut = lo + int(np.argmin(energy[lo:hi]))
+        boundaries.append(cut * window)
+        target = cut + chunk_windows
+    boundaries.append(len(audio))
+    return boundaries
+
+
+def _transcribe_chunk(args):
+    """Process-pool entry point: transcribe one audio chunk with this worker's cached model."""
+    chunk, model_size, language = args
+    model = get_whisper_model(model_size)
+    return model.transcribe(chunk, language=language, verbose=None)
+
+
+def _detect_chunk_language(args):
+    """Process-pool entry point: detect the spoken language of a chunk's first 30 s."""
+    chunk, model_size = args
+    model = get_whisper_model(model_size)
+    # large-v3 uses 128 mel bands, earlier models 80
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(chunk), n_mels=model.dims.n_mels).to(model.device)
+    _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+
+def stitch_chunk_results(results, offsets):
+    """Merge per-chunk Whisper results into one result with timestamps relative to the whole file."""
+    segments = []
+    texts = []
+    for result, offset in zip(results, offsets):
+        offset_seconds = offset / SAMPLE_RATE
+        for segment in result.get("segments", []):
+            segment = dict(segment)
+            segment["id"] = len(segments)
+            segment["start"] += offset_seconds
+            segment["end"] += offset_seconds
+            if "seek" in segment:
+                segment["seek"] += offset * 100 // SAMPLE_RATE  # seek is in 10 ms frames
+            if "words" in segment:
+                segment["words"] = [dict(w, start=w["start"] + offset_seconds, end=w["end"] + offset_seconds)
+                                    for w in segment["words"]]
+            segments.append(segment)
+        texts.append(result.get("text", "").strip())
+    return {
+        "text": " ".join(t for t in texts if t),
+        "segments": segments,
+        "language": results[0].get("language") if results else None,
+    }
+
+
+def iter_transcribe_segments(audio, model_size="base", chunk_seconds=STREAM_CHUNK_SECONDS, info=None):
+    """
+    Streaming transcription: yield (segment, position, duration) as each window is decoded.
+
+    The audio is cut at pauses into ~chunk_seconds windows that are transcribed
+    in order, each conditioned on the tail of the previous window's text.
+    Segment timestamps are relative to the whole file; position is the end of
+    the window just decoded, in seconds. The detected language is stored in
+    info['language'] when info is given.
+    """
+    model = get_whisper_model(model_size)
+    duration = len(audio) / SAMPLE_RATE
+    boundaries = find_silence_boundaries(audio, chunk_seconds, min(SILENCE_SEARCH_SECONDS, chunk_seconds / 4))
+    previous_text = ""
+    language = None
+    segment_id = 0
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        result = model.transcribe(audio[start:end], language=language, verbose=None,
+                                  initial_prompt=previous_text[-200:] or None)
+        language = language or result.get("language")
+        if info is not None:
+            info['language'] = language
+        previous_text = result.get("text", "")
+        for segment in stitch_chunk_results([result], [start])["segments"]:
+            segment["id"] = segment_id
+            segment_id += 1
+            yield segment, end / SAMPLE_RATE, duration
+
+
+def transcribe_streaming(audio_path, model_size="base", on_segment=None, chunk_seconds=STREAM_CHUNK_SECONDS):
+    """Transcribe window by window, calling on_segment(segment, position, duration) as segments arrive."""
+    segments = []
+    info = {'language': None}
+    audio = load_audio_array(audio_path)
+    for segment, position, duration in iter_transcribe_segments(audio, model_size, chunk_seconds, info):
+        segments.append(segment)
+        if on_segment:
+            on_segment(segment, position, duration)
+    return {
+        "text": "".join(segment["text"] for segment in segments).strip(),
+        "segments": segments,
+        "language": info['language'],
+    }
+
+
+def get_chunk_pool(workers=TRANSCRIBE_WORKERS):
+    """
+    Return this process's long-lived chunk pool, replacing it if a worker died and broke it.
+
+    Created on the first chunked transcription and kept for later ones, so
+    each chunk worker loads the Whisper weights once into its model cache
+    instead of once per job.
+    """
+    global _CHUNK_POOL
+    with _CHUNK_POOL_LOCK:
+        if _CHUNK_POOL is not None and getattr(_CHUNK_POOL, "_broken", False):
+            print("Whisper chunk pool is broken, starting a new one")
+            _CHUNK_POOL.shutdown(wait=False, cancel_futures=True)
+            _CHUNK_POOL = None
+        if _CHUNK_POOL is None:
+            _CHUNK_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _CHUNK_POOL
+
+
+def transcribe_chunked(audio_path, model_size="base", workers=TRANSCRIBE_WORKERS, chunk_seconds=CHUNK_SECONDS,
+                       on_segment=None):
+    """Decode audio once, split it at pauses and transcribe the chunks in a process pool."""
+    audio = load_audio_array(audio_path)
+    boundaries = find_silence_boundaries(audio, chunk_seconds)
+    offsets = boundaries[:-1]
+    chunks = [audio[start:end] for start, end in zip(boundaries[:-1], boundaries[1:])]
+    duration = len(audio) / SAMPLE_RATE
+    print(f"Split {duration:.0f}s of audio into {len(chunks)} chunks for {workers} workers")
+    if len(chunks) == 1:
+        result = get_whisper_model(model_size).transcribe(audio, verbose=None)
+        if on_segment:
+            for segment in result["segments"]:
+                on_segment(segment, duration, duration)
+        return result
+
+    pool = get_chunk_pool(workers)
+    results = []
+    # Detect the language once, on a worker, so every chunk is decoded consistently
+    # without loading a second copy of the model in this process
+    language = pool.submit(_detect_chunk_language, (chunks[0], model_size)).result()
+    futures = [pool.submit(_transcribe_chunk, (chunk, model_size, language)) for chunk in chunks]
+    try:
+        # Collected in chunk order, so segments can be streamed as soon as the prefix is done
+        for i, future in enumerate(futures):
+            result = future.result()
+            results.append(result)
+            if on_segment:
+                for segment in stitch_chunk_results([result], [offsets[i]])["segments"]:
+                    on_segment(segment, boundaries[i + 1] / SAMPLE_RATE, duration)
+    finally:
+        # The pool outlives this job; drop chunks nobody will read
+        for future in futures:
+            future.cancel()
+    return stitch_chunk_results(results, offsets)
+
+
+def transcribe_audio_whisper(audio_path, output_path=None, model_size="base", workers=TRANSCRIBE_WORKERS,
+                             chunk_seconds=CHUNK_SECONDS, on_segment=None):
+    """Transcribe audio/video using Whisper with better Windows path handling
+
+    When on_segment is given, segments are delivered as they are decoded as
+    on_segment(segment, position_seconds, duration_seconds).
+    """
     try:
         # Handle problematic characters in paths
         import re
@@ -30,7 +280,7 @@ def transcribe_audio_whisper(audio_path, output_path=None, model_size="base"):
                 job_id = filename.split('_')[0] if '_' in filename else None
                 if job_id:
                     for f in parent_dir.iterdir():
-                        if f.name.startswith(job_id) and f.suffix.lower() in ['.mp4', '.avi', '.mov', '.mkv']:
+                        if f.name.startswith(job_id) and f.suffix.lower() in ['.mp4', '.avi', '.mov', '.mkv', '.wav']:
                             print(f"Found similar file: {f}")
                             audio_path = f
                             break
@@ -42,15 +292,22 @@ def transcribe_audio_whisper(audio_path, output_path=None, model_size="base"):
         print(f"File exists: {audio_path.exists()}")
         print(f"File size: {audio_path.stat().st_size} bytes")
         
-        # Load Whisper model
-        model = whisper.load_model(model_size)
-        
         # Use raw string path for Whisper (convert Path to string with proper escaping)
         audio_path_str = str(audio_path)
         print(f"Using path for Whisper: {audio_path_str}")
         
-        # Transcribe using string path (Whisper expects string, not Path)
-        result = model.transcribe(audio_path_str, verbose=True)
+        if workers > 1:
+            # Long recordings: split at pauses and transcribe chunks in parallel
+            result = transcribe_chunked(audio_path_str, model_size, workers, chunk_seconds, on_segment)
+        elif on_segment:
+            # Streaming: hand segments to the caller window by window
+            result = transcribe_streaming(audio_path_str, model_size, on_segment)
+        else:
+            # Load Whisper model (cached across jobs in this process)
+            model = get_whisper_model(model_size)
+            
+            # Transcribe the decoded samples so prepared WAVs skip ffmpeg entirely
+            result = model.transcribe(load_audio_array(audio_path_str), verbose=True)
         
         # Handle output paths
         if output_path:
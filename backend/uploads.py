@@ -0,0 +1,250 @@
+"""
+Streaming upload helper shared by the video and document routers.
+
+The multipart body is parsed straight off the request stream instead of
+letting FastAPI spool the whole body to a temporary file before the handler
+runs. An oversized Content-Length is rejected before anything is read; the
+file part is sniffed from its first bytes, hashed on the fly and cut off as
+soon as it passes the size limit, so bad uploads are refused without
+receiving the rest of the body.
+"""
+
+import os
+import hashlib
+from fastapi import HTTPException
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+    from python_multipart.exceptions import MultipartParseError
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+    from multipart.exceptions import MultipartParseError
+
+MAX_VIDEO_UPLOAD_BYTES = int(os.getenv("MAX_VIDEO_UPLOAD_BYTES", str(4 * 1024 ** 3)))
+MAX_DOCUMENT_UPLOAD_BYTES = int(os.getenv("MAX_DOCUMENT_UPLOAD_BYTES", str(200 * 1024 ** 2)))
+
+VIDEO_KINDS = ("mp4", "mkv", "avi", "mpegts", "flv", "asf", "mpegps")
+DOCUMENT_KINDS = ("pdf", "zip", "ole", "text")
+SNIFF_BYTES = 4096  # bytes buffered before identifying the file type
+MAX_FORM_OVERHEAD_BYTES = 64 * 1024  # multipart headers and non-file fields
+
+QUICKTIME_ATOMS = (b"ftyp", b"moov", b"mdat", b"wide", b"free", b"skip", b"pnot")
+TS_PACKET_SIZES = (188, 192)  # plain TS, and M2TS with a 4-byte timestamp prefix
+
+
+def _is_mpegts(head):
+    """MPEG transport stream: a 0x47 sync byte at the start of several consecutive packets."""
+    for size in TS_PACKET_SIZES:
+        offset = size - 188
+        positions = range(offset, min(len(head), offset + 4 * size), size)
+        if len(positions) >= 2 and all(head[i] == 0x47 for i in positions):
+            return True
+    return False
+
+
+def sniff_container(head):
+    """Identify a file type from its first bytes. Returns a short kind string or None."""
+    if len(head) >= 12 and head[4:8] in QUICKTIME_ATOMS:
+        return "mp4"  # MP4 / MOV / M4V (ISO base media); older .mov files start at moov/mdat/wide/free
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "mkv"  # Matroska / WebM
+    if head.startswith(b"RIFF") and head[8:12] == b"AVI ":
+        return "avi"
+    if head.startswith(b"FLV\x01"):
+        return "flv"
+    if head.startswith(b"\x30\x26\xb2\x75\x8e\x66\xcf\x11"):
+        return "asf"  # WMV / WMA (ASF header GUID)
+    if head.startswith(b"\x00\x00\x01\xba"):
+        return "mpegps"  # MPEG program stream (.mpg / .vob)
+    if _is_mpegts(head):
+        return "mpegts"
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        return "zip"  # DOCX and other OOXML
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        return "ole"  # legacy .doc
+    if b"\x00" not in head:
+        try:
+            head.decode("utf-8")
+            return "text"
+        except UnicodeDecodeError:
+            # A multi-byte character may be cut at the chunk boundary
+            try:
+                head[:-3].decode("utf-8")
+                return "text"
+            except UnicodeDecodeError:
+                pass
+    return None
+
+
+class UploadSink:
+    """Writes one uploaded file to dest_path via a .part file, sniffing, hashing and size-checking it."""
+
+    def __init__(self, dest_path, max_bytes, allowed_kinds):
+        self.dest_path = dest_path
+        self.tmp_path = dest_path + ".part"
+        self.max_bytes = max_bytes
+        self.allowed_kinds = allowed_kinds
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.kind = None
+        self._head = b""
+        self._file = open(self.tmp_path, "wb")
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"File exceeds the {self.max_bytes} byte upload limit.")
+        if self.kind is None:
+            # Parts arrive in arbitrary slices; sniff once enough of the head is buffered
+            self._head += data
+            if len(self._head) < SNIFF_BYTES:
+                return
+            data, self._head = self._head, b""
+            self._sniff(data)
+        self.digest.update(data)
+        self._file.write(data)
+
+    def _sniff(self, head):
+        self.kind = sniff_container(head)
+        if self.kind not in self.allowed_kinds:
+            raise HTTPException(status_code=415, detail="Unsupported or unrecognized file type.")
+
+    def close(self):
+        """
+        Finish the file and move it into place.
+
+        Returns:
+            dict: {
+                'path': str,
+                'size': int,  # bytes written
+                'sha256': str,
+                'kind': str  # sniffed container type
+            }
+        """
+        if self.size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+        if self.kind is None:
+            head, self._head = self._head, b""
+            self._sniff(head)
+            self.digest.update(head)
+            self._file.write(head)
+        self._file.close()
+        os.replace(self.tmp_path, self.dest_path)
+        return {'path': self.dest_path, 'size': self.size, 'sha256': self.digest.hexdigest(), 'kind': self.kind}
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+async def receive_upload(request, dest_path_for, max_bytes, allowed_kinds, file_field="file"):
+    """
+    Parse a multipart/form-data request from its stream, saving the file part to disk.
+
+    Args:
+        request: Starlette request whose body hasn't been read
+        dest_path_for: Callable mapping the client's filename to the destination path
+        max_bytes (int): Upload limit for the file part
+        allowed_kinds (tuple): Accepted sniff_container kinds
+        file_field (str): Form field holding the file
+
+    Raises HTTPException 413 (from Content-Length before reading, or once the
+    file passes max_bytes), 415 if the file's first bytes don't match
+    allowed_kinds, and 400 for empty files or malformed bodies. A partial file
+    is removed in every case.
+
+    Returns:
+        dict: {
+            'fields': dict,  # other form fields, as strings
+            'file': dict or None  # UploadSink.close() result plus 'filename'
+        }
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MAX_FORM_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {max_bytes} byte upload limit.")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data":
+        # URL-only submissions may come form-encoded; these bodies are small
+        form = await request.form()
+        return {'fields': {key: value for key, value in form.items() if isinstance(value, str)}, 'file': None}
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Missing multipart boundary.")
+
+    events = []
+    header = {'field': b"", 'value': b""}
+    headers = []
+
+    def on_header_end():
+        headers.append((header['field'].lower(), header['value']))
+        header['field'] = header['value'] = b""
+
+    def on_headers_finished():
+        events.append(('headers', list(headers)))
+        headers.clear()
+
+    callbacks = {
+        'on_part_begin': lambda: None,
+        'on_header_field': lambda data, start, end: header.__setitem__('field', header['field'] + data[start:end]),
+        'on_header_value': lambda data, start, end: header.__setitem__('value', header['value'] + data[start:end]),
+        'on_header_end': on_header_end,
+        'on_headers_finished': on_headers_finished,
+        'on_part_data': lambda data, start, end: events.append(('data', bytes(data[start:end]))),
+        'on_part_end': lambda: events.append(('end', None)),
+    }
+    parser = MultipartParser(boundary, callbacks)
+
+    fields = {}
+    file_info = None
+    sink = None  # open file part
+    field = None  # (name, bytearray) of the open non-file part
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for event, value in events:
+                if event == 'headers':
+                    disposition = dict(value).get(b"content-disposition", b"")
+                    _, options = parse_options_header(disposition)
+                    name = options.get(b"name", b"").decode("utf-8", "replace")
+                    filename = options.get(b"filename")
+                    if filename is not None:
+                        # Only the first file part of file_field is kept; others are drained and ignored
+                        if name == file_field and sink is None and file_info is None:
+                            filename = os.path.basename(filename.decode("utf-8", "replace"))
+                            sink = UploadSink(dest_path_for(filename), max_bytes, allowed_kinds)
+                            sink.filename = filename
+                    else:
+                        field = (name, bytearray())
+                elif event == 'data':
+                    if sink is not None:
+                        sink.write(value)
+                    elif field is not None:
+                        field[1].extend(value)
+                        if len(field[1]) > MAX_FORM_OVERHEAD_BYTES:
+                            raise HTTPException(status_code=413, detail=f"Form field '{field[0]}' is too large.")
+                elif event == 'end':
+                    if sink is not None:
+                        file_info = dict(sink.close(), filename=sink.filename)
+                        sink = None
+                    elif field is not None:
+                        fields[field[0]] = field[1].decode("utf-8", "replace")
+                        field = None
+            events.clear()
+        parser.finalize()
+    except BaseException as e:
+        if sink is not None:
+            sink.abort()
+        if file_info is not None:
+            os.remove(file_info['path'])
+        if isinstance(e, MultipartParseError):
+            raise HTTPException(status_code=400, detail="Malformed multipart body.") from e
+        raise
+    if sink is not None:
+        # Body ended mid-part
+        sink.abort()
+        raise HTTPException(status_code=400, detail="Upload was truncated.")
+    return {'fields': fields, 'file': file_info}
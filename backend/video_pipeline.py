@@ -0,0 +1,247 @@
+"""
+Heavy branches of the video pipeline.
+
+Screenshot extraction and transcription are independent, so videos.py runs
+them concurrently in a shared process pool (separate processes, so they don't
+contend for the GIL) and joins them before note generation. Everything here is
+importable without FastAPI so spawned workers stay light.
+"""
+
+import os
+import sys
+import json
+import queue
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+BRANCH_WORKERS = int(os.getenv("VIDEO_BRANCH_WORKERS", "2"))
+PARTIAL_TRANSCRIPT_FILENAME = "transcript.partial.jsonl"  # segments appended as Whisper decodes them
+TRANSCRIPT_PROGRESS_FILENAME = "transcript.progress.json"  # audio position / duration of the running transcription
+
+# CLIP and Whisper only ever run in the branch workers, so that is where they are preloaded
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "").lower() in ("1", "true", "yes")
+PRELOAD_WHISPER_MODELS = [m.strip() for m in os.getenv("PRELOAD_WHISPER_MODELS", "base").split(",") if m.strip()]
+
+# Long-lived pool so workers keep their CLIP/Whisper caches between jobs
+_POOL_LOCK = threading.Lock()
+_BRANCH_POOL = None
+_STATS_QUEUE = None  # workers report their model cache stats here
+_WORKER_STATS = {}  # pid -> latest report, drained from _STATS_QUEUE
+
+
+def _report_model_stats():
+    """Worker side: send this process's CLIP/Whisper cache stats to the API process."""
+    if _STATS_QUEUE is None:
+        return
+    report = {'pid': os.getpid()}
+    # Only report models this worker has imported; importing them just for stats would defeat the point
+    if 'extract_diagram_frames' in sys.modules:
+        report['clip'] = sys.modules['extract_diagram_frames'].get_clip_cache_stats()
+    if 'transcribe_whisper' in sys.modules:
+        report['whisper'] = sys.modules['transcribe_whisper'].get_whisper_cache_stats()
+    try:
+        _STATS_QUEUE.put_nowait(report)
+    except Exception as e:
+        print(f"Could not report model stats: {e}")
+
+
+def _init_branch_worker(stats_queue, preload, whisper_models):
+    """Pool initializer: remember the stats queue and optionally load the models up front."""
+    global _STATS_QUEUE
+    _STATS_QUEUE = stats_queue
+    if preload:
+        try:
+            from extract_diagram_frames import warm_clip_model
+            warm_clip_model()
+        except Exception as e:
+            print(f"CLIP preload skipped: {e}")
+        try:
+            from transcribe_whisper import warm_whisper_models
+            warm_whisper_models(whisper_models)
+        except Exception as e:
+            print(f"Whisper preload skipped: {e}")
+    _report_model_stats()
+
+
+def get_branch_pool():
+    """Return the shared branch pool, replacing it if a worker died (e.g. OOM-killed) and broke it."""
+    global _BRANCH_POOL, _STATS_QUEUE
+    with _POOL_LOCK:
+        if _BRANCH_POOL is not None and getattr(_BRANCH_POOL, "_broken", False):
+            print("Video branch pool is broken, starting a new one")
+            _BRANCH_POOL.shutdown(wait=False, cancel_futures=True)
+            _BRANCH_POOL = None
+            _WORKER_STATS.clear()
+        if _BRANCH_POOL is None:
+            ctx = multiprocessing.get_context("spawn")
+            _STATS_QUEUE = ctx.Queue()
+            _BRANCH_POOL = ProcessPoolExecutor(max_workers=BRANCH_WORKERS, mp_context=ctx,
+                                               initializer=_init_branch_worker,
+                                               initargs=(_STATS_QUEUE, PRELOAD_MODELS, PRELOAD_WHISPER_MODELS))
+        return _BRANCH_POOL
+
+
+def _ready():
+    return os.getpid()
+
+
+def warm_branch_pool():
+    """Start every branch worker now (running the model preload) instead of on the first job."""
+    pool = get_branch_pool()
+    futures = [pool.submit(_ready) for _ in range(BRANCH_WORKERS)]
+    return sorted({future.result() for future in futures})
+
+
+def get_branch_model_stats():
+    """
+    Latest model cache stats reported by each live branch worker.
+
+    Returns:
+        dict: {pid: {'pid': int, 'clip': dict, 'whisper': dict}}  # clip/whisper only once loaded
+    """
+    with _POOL_LOCK:
+        stats_queue = _STATS_QUEUE
+        while stats_queue is not None:
+            try:
+                report = stats_queue.get_nowait()
+            except queue.Empty:
+                break
+            _WORKER_STATS[report['pid']] = report
+        return dict(_WORKER_STATS)
+
+
+def extract_screenshots_branch(video_path, screenshots_dir):
+    """Branch A: CLIP screenshot extraction. Returns the extraction stats."""
+    from extract_diagram_frames import extract_relevant_frames
+    os.makedirs(screenshots_dir, exist_ok=True)
+    try:
+        return extract_relevant_frames(video_path, screenshots_dir)
+    finally:
+        _report_model_stats()
+
+
+class PartialTranscriptWriter:
+    """Streams Whisper segments to transcript_dir so the API process and UI can follow along."""
+
+    def __init__(self, transcript_dir):
+        self.segments_path = os.path.join(transcript_dir, PARTIAL_TRANSCRIPT_FILENAME)
+        self.progress_path = os.path.join(transcript_dir, TRANSCRIPT_PROGRESS_FILENAME)
+        self.count = 0
+        # Start fresh so a re-run doesn't duplicate segments or report stale progress
+        open(self.segments_path, "w", encoding="utf-8").close()
+        if os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+
+    def __call__(self, segment, position, duration):
+        with open(self.segments_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({'start': segment['start'], 'end': segment['end'], 'text': segment['text']},
+                               ensure_ascii=False) + "\n")
+        self.count += 1
+        progress = {'position': position, 'duration': duration, 'segments': self.count}
+        tmp_path = self.progress_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, self.progress_path)
+
+
+def read_transcription_progress(transcript_dir):
+    """Return the fraction (0-1) of audio transcribed so far, or None if nothing has been reported."""
+    progress_path = os.path.join(transcript_dir, TRANSCRIPT_PROGRESS_FILENAME)
+    try:
+        with open(progress_path, "r", encoding="utf-8") as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not progress.get('duration'):
+        return None
+    return min(1.0, progress['position'] / progress['duration'])
+
+
+def transcribe_branch(url, video_path, audio_path, transcript_dir, subtitle_track=None):
+    """
+    Branch B: subtitles for YouTube URLs, falling back to Whisper.
+
+    subtitle_track is the track already downloaded by youtube_download.fetch_video;
+    when the download resolved the URL without finding subtitles there is no
+    second metadata lookup. audio_path is the separately downloaded audio-only
+    stream, if any. Only the Whisper fallback demuxes audio (to the cached
+    transcript_dir/audio.wav), so jobs served by subtitles never pay for it and
+    the screenshot branch doesn't wait on it.
+
+    Writes transcript.txt (and subtitles.txt when subtitles were used) to
+    transcript_dir.
+
+    Returns:
+        dict: {
+            'transcript_source': str,  # e.g. 'manual_subtitles', 'whisper_audio'
+            'subtitle_method': str or None
+        }
+    """
+    transcript_txt = os.path.join(transcript_dir, "transcript.txt")
+    subtitle_txt = os.path.join(transcript_dir, "subtitles.txt")
+    os.makedirs(transcript_dir, exist_ok=True)
+
+    # First attempt: use the subtitles fetched alongside the YouTube download
+    if subtitle_track:
+        try:
+            from extract_subtitles import extract_and_process_subtitles
+            subtitle_result = extract_and_process_subtitles(url, transcript_dir, subtitle_track)
+
+            if subtitle_result['success']:
+                # Save subtitle text as transcript
+                with open(transcript_txt, "w", encoding="utf-8") as f:
+                    f.write(subtitle_result['subtitle_text'])
+                # Timed segments in the same shape as Whisper's transcript.json
+                with open(os.path.splitext(transcript_txt)[0] + ".json", "w", encoding="utf-8") as f:
+                    json.dump({'text': subtitle_result['subtitle_text'], 'language': subtitle_result['language'],
+                               'segments': subtitle_result['timestamps']}, f, ensure_ascii=False)
+
+                # Also save subtitle-specific file with metadata
+                subtitle_info = {
+                    'language': subtitle_result['language'],
+                    'method': subtitle_result['method'],
+                    'timestamps': subtitle_result['timestamps']
+                }
+
+                with open(subtitle_txt, "w", encoding="utf-8") as f:
+                    f.write(f"# Subtitle Information\n")
+                    f.write(f"Language: {subtitle_info['language']}\n")
+                    f.write(f"Method: {subtitle_info['method']} subtitles\n")
+                    f.write(f"Segments: {len(subtitle_info['timestamps'])}\n\n")
+                    f.write(f"# Subtitle Text\n\n")
+                    f.write(subtitle_result['subtitle_text'])
+
+                return {
+                    'transcript_source': f"{subtitle_result['method']}_subtitles",
+                    'subtitle_method': subtitle_result['method'],
+                }
+        except Exception as e:
+            print(f"Subtitle extraction failed: {str(e)}")
+            # Continue to audio transcription fallback
+
+    # Fallback: Audio transcription with Whisper if subtitles failed or not available
+    from media_prep import extract_audio_track
+    from transcribe_whisper import transcribe_audio_whisper
+    try:
+        # Demux once; prefer the audio-only download when there is one
+        audio_path = extract_audio_track(audio_path or video_path, transcript_dir)['audio_path']
+    except Exception as e:
+        # Whisper can still decode the original file
+        print(f"Audio extraction skipped: {str(e)}")
+    try:
+        transcribe_audio_whisper(audio_path or video_path, transcript_txt,
+                                 on_segment=PartialTranscriptWriter(transcript_dir))
+    finally:
+        _report_model_stats()
+    return {'transcript_source': "whisper_audio", 'subtitle_method': None}
+
+
+def load_transcript_segments(transcript_dir):
+    """Return the timed segments ({'start', 'end', 'text'}) saved with transcript.txt, or None."""
+    try:
+        with open(os.path.join(transcript_dir, "transcript.json"), "r", encoding="utf-8") as f:
+            segments = json.load(f).get('segments')
+    except (OSError, ValueError):
+        return None
+    return segments or None
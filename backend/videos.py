@@ -1,9 +1,16 @@
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import PlainTextResponse
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from typing import Optional
 from schemas import JobStatus
+from uploads import receive_upload, MAX_VIDEO_UPLOAD_BYTES, MAX_FORM_OVERHEAD_BYTES, VIDEO_KINDS
+import artifact_cache
+from job_scheduler import VIDEO_SCHEDULER, QueueFull, acquire_stage, release_stage
+from job_store import VIDEO_JOBS
+from progress_events import stream_progress, PROGRESS_HUB
 import os
+import json
 import uuid
 
 
@@ -27,86 +34,131 @@ os.makedirs("ai_screenshots", exist_ok=True)
 os.makedirs("transcripts", exist_ok=True)
 os.makedirs("notes", exist_ok=True)
 
-# Progress tracking for video jobs
-VIDEO_PROGRESS = {}
-
-def update_video_progress(job_id: str, progress: int, stage: str, message: str):
-    VIDEO_PROGRESS[job_id] = {"progress": progress, "stage": stage, "message": message}
+# Progress and status for video jobs live in the shared job store, so any
+# API worker can answer for a job processed by another one
+def update_video_progress(job_id: str, progress: int, stage: str, message: str, branches: Optional[dict] = None):
+    entry = {"progress": progress, "stage": stage, "message": message}
+    if branches is not None:
+        # Per-branch state while screenshots and transcription run in parallel
+        entry["branches"] = dict(branches)
+    VIDEO_JOBS.set_progress(job_id, entry)
 
 @router.get("/video/progress/{job_id}")
-def get_video_progress(job_id: str):
-    return VIDEO_PROGRESS.get(job_id, {"progress": 0, "stage": "pending", "message": "Not started"})
+async def get_video_progress(job_id: str):
+    job = await VIDEO_JOBS.get(job_id)
+    if not job or not job['progress']:
+        return {"progress": 0, "stage": "pending", "message": "Not started"}
+    return job['progress']
+
+@router.get("/video/progress/{job_id}/stream")
+async def stream_video_progress(job_id: str, request: Request):
+    # Server-Sent Events: one event per progress change, closed after completed/error
+    default = {"progress": 0, "stage": "pending", "message": "Not started"}
+    return StreamingResponse(stream_progress(VIDEO_JOBS, job_id, request, default),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-# Real job status store - improved
-JOBS = {}
+def queue_full_error():
+    return HTTPException(status_code=429, detail="Video job queue is full, please retry later.",
+                         headers={"Retry-After": "30"})
 
 @router.post("/video/submit_job/", response_model=dict)
-def submit_video_job(
-    url: Optional[str] = Form(None),
-    file: Optional[UploadFile] = File(None),
-    screenshot_interval: Optional[int] = Form(None),
-    smart_mode: Optional[bool] = Form(False)
-):
-    import subprocess
-    import threading
-    from fastapi import status
+async def submit_video_job(request: Request):
+    # Multipart form: url or file, plus an optional priority. The body is read
+    # off the request stream by receive_upload instead of being spooled to a
+    # temporary file by FastAPI before this handler runs.
+    
+    # Backpressure: refuse an upload before reading its body. URL-only
+    # submissions are small; they go through the artifact cache first and are
+    # only refused if they miss it
+    content_length = request.headers.get("content-length")
+    has_upload = not (content_length and content_length.isdigit()
+                      and int(content_length) <= MAX_FORM_OVERHEAD_BYTES)
+    if has_upload and VIDEO_SCHEDULER.is_full():
+        raise queue_full_error()
     
     job_id = str(uuid.uuid4())
     
     # Add to jobs with pending status initially
-    JOBS[job_id] = JobStatus(job_id=job_id, status="pending")
+    VIDEO_JOBS.set_status(job_id, JobStatus(job_id=job_id, status="pending"))
+    
+    def upload_path(filename):
+        update_video_progress(job_id, 10, "uploading", "Saving video file...")
+        # Create a safe filename without special characters
+        import re
+        safe_filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+        return os.path.join(UPLOAD_DIR, f"{job_id}_{safe_filename}")
+    
+    try:
+        # Oversized (by Content-Length or while streaming) and non-video uploads
+        # are rejected as soon as that is known; memory stays bounded
+        form = await receive_upload(request, upload_path, MAX_VIDEO_UPLOAD_BYTES, VIDEO_KINDS)
+    except Exception:
+        # Rejected, malformed or disconnected mid-upload: no job was started
+        VIDEO_JOBS.delete(job_id)
+        raise
+    url = form['fields'].get('url') or None
+    try:
+        priority = int(form['fields'].get('priority') or 0)
+    except ValueError:
+        VIDEO_JOBS.delete(job_id)
+        if form['file']:
+            os.remove(form['file']['path'])
+        raise HTTPException(status_code=422, detail="priority must be an integer.")
+    
+    # The rest touches the artifact cache and the filesystem; keep it off the event loop
+    return await run_in_threadpool(start_video_job, job_id, url, form['file'], priority)
+
+def start_video_job(job_id: str, url: Optional[str], upload_info: Optional[dict], priority: int):
+    import subprocess
+    
+    safe_filename = os.path.basename(upload_info['path']) if upload_info else None
+    
+    # Reuse the artifacts of an identical earlier job (same file content or
+    # video ID, same pipeline code and config) instead of recomputing them
+    artifact_key = None
+    if upload_info or url:
+        artifact_key = artifact_cache.cache_key(upload_info['sha256'] if upload_info else None, url)
+        cached_job_id = artifact_cache.lookup(artifact_key)
+        if cached_job_id:
+            reuse = artifact_cache.reuse_artifacts(cached_job_id, job_id)
+            if upload_info:
+                # The original upload is kept with the source job
+                os.remove(upload_info['path'])
+            message = f"Reused artifacts from job {cached_job_id} ({reuse['seconds'] * 1000:.0f} ms)"
+            update_video_progress(job_id, 100, "completed", message)
+            VIDEO_JOBS.update_progress(job_id, cache_hit=True)
+            VIDEO_JOBS.set_status(job_id, JobStatus(job_id=job_id, status="completed", progress=100, message=message))
+            return {"job_id": job_id, "cache_hit": True}
     
     # Process in background thread
     def process_video():
         try:
+            VIDEO_JOBS.set_status(job_id, JobStatus(job_id=job_id, status="processing"))
             update_video_progress(job_id, 5, "starting", "Initializing video processing...")
             
             error_messages = []
             file_location = None
+            subtitle_track = None
+            downloaded_audio = None
+            bytes_downloaded = None
             
-            if file:
-                # Handle file upload
-                update_video_progress(job_id, 10, "uploading", "Saving video file...")
-                os.makedirs(UPLOAD_DIR, exist_ok=True)
-                
-                # Create a safe filename without special characters
-                import re
-                safe_filename = re.sub(r'[<>:"/\\|?*]', '_', file.filename)
-                safe_filename = f"{job_id}_{safe_filename}"
-                file_location = os.path.join(UPLOAD_DIR, safe_filename)
-                
-                with open(file_location, "wb") as f:
-                    content = file.file.read()
-                    f.write(content)
+            if upload_info:
+                # Upload was already streamed to disk by the request handler
+                file_location = upload_info['path']
                 source = safe_filename
                 
             elif url:
                 # Handle YouTube URL download
                 update_video_progress(job_id, 10, "downloading", "Downloading video from URL...")
                 try:
-                    import yt_dlp
-                    os.makedirs(UPLOAD_DIR, exist_ok=True)
-                    
-                    # Create a safe output filename
-                    safe_job_filename = f"{job_id}_video.%(ext)s"
-                    
-                    # Configure yt-dlp options
-                    ydl_opts = {
-                        'outtmpl': os.path.join(UPLOAD_DIR, safe_job_filename),
-                        'format': 'best[height<=720]',  # Download reasonable quality
-                        'restrictfilenames': True,  # Use only ASCII characters
-                    }
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        info = ydl.extract_info(url, download=True)
-                        # Find the downloaded file
-                        for file_path in os.listdir(UPLOAD_DIR):
-                            if file_path.startswith(job_id):
-                                file_location = os.path.join(UPLOAD_DIR, file_path)
-                                break
-                    
-                    if not file_location or not os.path.exists(file_location):
-                        raise Exception("Downloaded file not found")
+                    # One metadata resolution fetches the media and subtitles together
+                    from youtube_download import fetch_video
+                    download = fetch_video(url, job_id, UPLOAD_DIR, os.path.join("transcripts", job_id))
+                    file_location = download['file_location']
+                    subtitle_track = download['subtitle_track']
+                    downloaded_audio = download['audio_location']
+                    bytes_downloaded = download['bytes_downloaded']
                     
                     source = url
                     update_video_progress(job_id, 20, "extracting", "Video downloaded successfully, extracting screenshots...")
@@ -120,79 +172,75 @@ def submit_video_job(
                 update_video_progress(job_id, 0, "error", "No video file or URL provided")
                 return
             
-            # Extract screenshots using AI
-            update_video_progress(job_id, 20, "extracting", "Extracting intelligent screenshots...")
+            # Screenshot extraction and transcription are independent: run them
+            # in parallel worker processes and join before note generation
             screenshots_dir = os.path.join("ai_screenshots", job_id)
-            try:
-                from extract_diagram_frames import extract_relevant_frames
-                os.makedirs(screenshots_dir, exist_ok=True)
-                extract_relevant_frames(file_location, screenshots_dir)
-                update_video_progress(job_id, 40, "transcribing", "Screenshots extracted, starting transcription...")
-            except Exception as e:
-                error_msg = f"Screenshot extraction failed: {str(e)}"
-                error_messages.append(error_msg)
-                update_video_progress(job_id, 20, "error", error_msg)
-                return
-            
-            # Try subtitle extraction first (for YouTube videos), then fallback to audio transcription
-            update_video_progress(job_id, 40, "transcribing", "Attempting subtitle extraction...")
             transcript_dir = os.path.join("transcripts", job_id)
             transcript_txt = os.path.join(transcript_dir, "transcript.txt")
             subtitle_txt = os.path.join(transcript_dir, "subtitles.txt")
             transcript_source = "unknown"
-            
+            os.makedirs(screenshots_dir, exist_ok=True)
             os.makedirs(transcript_dir, exist_ok=True)
             
-            # First attempt: Extract subtitles if this is a YouTube URL
-            subtitle_success = False
-            if url:  # This is a YouTube URL
-                try:
-                    from extract_subtitles import extract_and_process_subtitles
-                    update_video_progress(job_id, 45, "transcribing", "Extracting YouTube subtitles...")
-                    
-                    subtitle_result = extract_and_process_subtitles(url, transcript_dir)
-                    
-                    if subtitle_result['success']:
-                        # Save subtitle text as transcript
-                        with open(transcript_txt, "w", encoding="utf-8") as f:
-                            f.write(subtitle_result['subtitle_text'])
-                        
-                        # Also save subtitle-specific file with metadata
-                        subtitle_info = {
-                            'language': subtitle_result['language'],
-                            'method': subtitle_result['method'],
-                            'timestamps': subtitle_result['timestamps']
-                        }
-                        
-                        with open(subtitle_txt, "w", encoding="utf-8") as f:
-                            f.write(f"# Subtitle Information\n")
-                            f.write(f"Language: {subtitle_info['language']}\n")
-                            f.write(f"Method: {subtitle_info['method']} subtitles\n")
-                            f.write(f"Segments: {len(subtitle_info['timestamps'])}\n\n")
-                            f.write(f"# Subtitle Text\n\n")
-                            f.write(subtitle_result['subtitle_text'])
-                        
-                        subtitle_success = True
-                        transcript_source = f"{subtitle_result['method']}_subtitles"
-                        update_video_progress(job_id, 60, "aligning", f"Subtitle extraction successful ({subtitle_result['method']}), aligning with frames...")
-                        
-                except Exception as e:
-                    print(f"Subtitle extraction failed: {str(e)}")
-                    # Continue to audio transcription fallback
+            from concurrent.futures import wait, FIRST_COMPLETED
+            from video_pipeline import (get_branch_pool, extract_screenshots_branch, transcribe_branch,
+                                        read_transcription_progress)
             
-            # Fallback: Audio transcription with Whisper if subtitles failed or not available
-            if not subtitle_success:
+            def submit_branch(stage, fn, *args):
+                # Per-stage slot (CLIP / Whisper concurrency across jobs), released when the branch ends
+                acquire_stage(stage)
                 try:
-                    from transcribe_whisper import transcribe_audio_whisper
-                    update_video_progress(job_id, 45, "transcribing", "Transcribing audio with Whisper...")
-                    result = transcribe_audio_whisper(file_location, transcript_txt)
-                    transcript_source = "whisper_audio"
-                    update_video_progress(job_id, 60, "aligning", "Audio transcription complete, aligning with frames...")
-                except Exception as e:
-                    error_msg = f"Whisper transcription failed: {str(e)}"
-                    error_messages.append(error_msg)
-                    update_video_progress(job_id, 40, "error", error_msg)
-                    return
+                    # Fetched after the wait so a pool broken meanwhile has been replaced
+                    future = get_branch_pool().submit(fn, *args)
+                except Exception:
+                    release_stage(stage)
+                    raise
+                future.add_done_callback(lambda _: release_stage(stage))
+                return future
+            
+            update_video_progress(job_id, 20, "processing", "Waiting for a screenshot/transcription slot...")
+            branches = {
+                submit_branch("screenshots", extract_screenshots_branch, file_location, screenshots_dir): "screenshots",
+                submit_branch("transcript", transcribe_branch, url, file_location,
+                              downloaded_audio, transcript_dir, subtitle_track): "transcript",
+            }
+            branch_status = {"screenshots": "running", "transcript": "running"}
+            update_video_progress(job_id, 20, "processing", "Extracting screenshots and transcribing...", branch_status)
+            
+            pending = set(branches)
+            while pending:
+                done, pending = wait(pending, timeout=2, return_when=FIRST_COMPLETED)
+                if not done:
+                    # Follow Whisper's streamed segments while the branches run
+                    fraction = read_transcription_progress(transcript_dir)
+                    if fraction is not None and branch_status["transcript"] == "running":
+                        screenshots_done = 20 if branch_status["screenshots"] == "completed" else 0
+                        message = (f"Screenshots: {branch_status['screenshots']}, "
+                                   f"transcribed {fraction * 100:.0f}% of audio")
+                        update_video_progress(job_id, 20 + screenshots_done + int(20 * fraction), "processing",
+                                              message, branch_status)
+                    continue
+                for future in done:
+                    name = branches[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        label = "Screenshot extraction" if name == "screenshots" else "Transcription"
+                        error_msg = f"{label} failed: {str(e)}"
+                        error_messages.append(error_msg)
+                        branch_status[name] = "error"
+                        for other in pending:
+                            other.cancel()
+                        update_video_progress(job_id, 20, "error", error_msg, branch_status)
+                        VIDEO_JOBS.set_status(job_id, JobStatus(job_id=job_id, status="failed"))
+                        return
+                    branch_status[name] = "completed"
+                    if name == "transcript":
+                        transcript_source = result['transcript_source']
+                # Each finished branch accounts for half of the 20-60% range
+                finished = sum(1 for status in branch_status.values() if status == "completed")
+                message = f"Screenshots: {branch_status['screenshots']}, transcript: {branch_status['transcript']}"
+                update_video_progress(job_id, 20 + 20 * finished, "processing", message, branch_status)
             
             # Align subtitles with frames (optional step)
             update_video_progress(job_id, 60, "aligning", "Aligning subtitles with frames...")
@@ -250,14 +298,22 @@ def submit_video_job(
                     except:
                         subtitle_info = None
                 
-                # Generate notes with enhanced information
+                # Generate notes with enhanced information; long transcripts are
+                # split on segment times and generated chunk by chunk
+                from video_pipeline import load_transcript_segments
+                notes_stats = {}
                 notes_content = generate_notes_from_transcript(
                     transcript_content, 
                     alignment_path, 
                     screenshots_dir,
                     transcript_source,
-                    subtitle_info
+                    subtitle_info,
+                    segments=load_transcript_segments(transcript_dir),
+                    stats=notes_stats
                 )
+                if notes_stats.get('chunks'):
+                    with open(os.path.join(notes_dir, "notes_stats.json"), "w", encoding="utf-8") as f:
+                        json.dump(notes_stats, f, indent=2)
                 
                 # Save notes with metadata header
                 notes_with_metadata = f"""# Video Notes
@@ -275,30 +331,48 @@ def submit_video_job(
                     f.write(notes_with_metadata)
                 
                 update_video_progress(job_id, 100, "completed", "Video processing completed successfully!")
-                JOBS[job_id] = JobStatus(job_id=job_id, status="completed")
+                VIDEO_JOBS.set_status(job_id, JobStatus(job_id=job_id, status="completed",
+                                                        bytes_downloaded=bytes_downloaded))
+                if artifact_key:
+                    artifact_cache.record(artifact_key, job_id, source)
                 
             except Exception as e:
                 error_msg = f"Note generation failed: {str(e)}"
                 error_messages.append(error_msg)
                 update_video_progress(job_id, 80, "error", error_msg)
-                JOBS[job_id] = JobStatus(job_id=job_id, status="failed")
+                VIDEO_JOBS.set_status(job_id, JobStatus(job_id=job_id, status="failed"))
                 return
                 
         except Exception as e:
             error_msg = f"Video processing failed: {str(e)}"
             update_video_progress(job_id, 0, "error", error_msg)
-            JOBS[job_id] = JobStatus(job_id=job_id, status="failed")
+            VIDEO_JOBS.set_status(job_id, JobStatus(job_id=job_id, status="failed"))
     
-    # Start processing in background
-    thread = threading.Thread(target=process_video)
-    thread.daemon = True
-    thread.start()
+    # Queue for the bounded worker pool; /video/job_status reports the live position.
+    # A full queue refuses cache misses here, after the lookup above
+    update_video_progress(job_id, 0, "queued", "Waiting in queue for a worker...")
+    try:
+        position = VIDEO_SCHEDULER.submit(job_id, process_video, priority or 0)
+    except QueueFull:
+        VIDEO_JOBS.delete(job_id)
+        if upload_info:
+            os.remove(upload_info['path'])
+        raise queue_full_error()
     
-    return {"job_id": job_id}
+    return {"job_id": job_id, "cache_hit": False, "queue_position": position}
 
 @router.get("/video/job_status/{job_id}", response_model=JobStatus)
-def get_job_status(job_id: str):
-    job = JOBS.get(job_id)
-    if not job:
+async def get_job_status(job_id: str):
+    job = await VIDEO_JOBS.get(job_id)
+    if not job or not job['status']:
         raise HTTPException(status_code=404, detail="Job not found.")
-    return job
+    status = JobStatus(**job['status'])
+    # Only the worker that owns the job knows its place in the queue
+    position = VIDEO_SCHEDULER.position(job_id)
+    if position:
+        return status.copy(update={"queue_position": position})
+    return status
+
+@router.get("/video/scheduler")
+def get_scheduler_stats():
+    return dict(VIDEO_SCHEDULER.stats(), progress_subscribers=PROGRESS_HUB.subscriber_count())
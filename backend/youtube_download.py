@@ -0,0 +1,172 @@
+"""
+Single-pass YouTube fetch for video jobs.
+
+One yt-dlp extract_info call resolves the metadata, downloads the media and
+writes the preferred English subtitle track, so the subtitle stage doesn't need
+its own metadata round trip. The info dict is cached next to the transcript.
+The YoutubeDL class is injectable, so the shared path can be exercised offline
+with a local stand-in extractor.
+"""
+
+import os
+import json
+
+SUBTITLE_LANGS = ['en', 'en-US', 'en-GB']  # priority order
+INFO_FILENAME = "video_info.json"
+
+# Download profiles. CLIP ViT-B/32 sees 224px frames and Whisper only needs
+# audio, so the default fetches the smallest video-only stream that keeps slides
+# legible plus a separate audio-only stream.
+DOWNLOAD_PROFILES = {
+    'slides': {
+        'format': 'bv*[height<=480][height>=360]/bv*[height<=480]/b[height<=480],ba/b',
+        'format_sort': ['res:480', '+size', '+br'],
+    },
+    'legacy': {
+        'format': 'best[height<=720]',
+        'format_sort': [],
+    },
+}
+DOWNLOAD_PROFILE = os.getenv("YTDLP_PROFILE", "slides")
+FRAGMENT_CONCURRENCY = int(os.getenv("YTDLP_FRAGMENT_CONCURRENCY", "4"))
+
+
+def select_subtitle_track(info, subtitle_dir=None):
+    """
+    Pick the subtitle track yt-dlp wrote for this video, preferring manual over auto-generated.
+
+    Returns:
+        dict: {'subtitle_file': str, 'language': str, 'method': 'manual' | 'auto'} or None
+    """
+    requested = info.get('requested_subtitles') or {}
+    subtitles = info.get('subtitles') or {}
+    for lang in SUBTITLE_LANGS:
+        track = requested.get(lang)
+        if not track:
+            continue
+        subtitle_file = track.get('filepath')
+        if not subtitle_file and subtitle_dir:
+            subtitle_file = os.path.join(subtitle_dir, f"subtitles.{lang}.{track.get('ext', 'vtt')}")
+        if subtitle_file and os.path.exists(subtitle_file):
+            return {
+                'subtitle_file': subtitle_file,
+                'language': lang,
+                'method': 'manual' if lang in subtitles else 'auto',
+            }
+    return None
+
+
+def load_cached_info(transcript_dir):
+    """Return the info dict cached by fetch_video for this job, or None."""
+    info_path = os.path.join(transcript_dir, INFO_FILENAME)
+    if not os.path.exists(info_path):
+        return None
+    with open(info_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _extract(ydl_class, ydl_opts, url):
+    with ydl_class(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=True)
+        if hasattr(ydl, 'sanitize_info'):
+            info = ydl.sanitize_info(info)
+    return info
+
+
+def split_downloads(info):
+    """Return (video_path, audio_path) from an info dict's requested downloads.
+
+    audio_path is None when the video file also carries the audio track.
+    """
+    video_path = None
+    audio_path = None
+    for download in info.get('requested_downloads') or []:
+        path = download.get('filepath')
+        if not path or not os.path.exists(path):
+            continue
+        if download.get('vcodec', 'none') != 'none':
+            video_path = video_path or path
+        elif download.get('acodec', 'none') != 'none':
+            audio_path = audio_path or path
+    return video_path, audio_path
+
+
+def fetch_video(url, job_id, upload_dir, transcript_dir, ydl_class=None, profile=DOWNLOAD_PROFILE,
+                fragment_concurrency=FRAGMENT_CONCURRENCY):
+    """
+    Download a video and its subtitles with a single metadata resolution.
+
+    Args:
+        url (str): YouTube (or other yt-dlp supported) URL
+        job_id (str): Job ID used to name the media file
+        upload_dir (str): Directory for the downloaded media
+        transcript_dir (str): Directory for subtitles and the cached info dict
+        ydl_class: YoutubeDL-compatible class (defaults to yt_dlp.YoutubeDL)
+        profile (str): Key of DOWNLOAD_PROFILES
+        fragment_concurrency (int): Fragments of DASH/HLS streams fetched in parallel
+
+    Returns:
+        dict: {
+            'file_location': str,  # video (possibly video-only) file
+            'audio_location': str or None,  # separate audio-only file, if one was fetched
+            'bytes_downloaded': int,
+            'info': dict,  # sanitized yt-dlp info dict
+            'subtitle_track': dict or None  # see select_subtitle_track
+        }
+    """
+    if ydl_class is None:
+        import yt_dlp
+        ydl_class = yt_dlp.YoutubeDL
+    os.makedirs(upload_dir, exist_ok=True)
+    os.makedirs(transcript_dir, exist_ok=True)
+
+    ydl_opts = {
+        'outtmpl': {
+            # format_id keeps the video and audio streams from overwriting each other
+            'default': os.path.join(upload_dir, f"{job_id}_video.f%(format_id)s.%(ext)s"),
+            'subtitle': os.path.join(transcript_dir, "subtitles.%(ext)s"),
+        },
+        'format': DOWNLOAD_PROFILES[profile]['format'],
+        'format_sort': DOWNLOAD_PROFILES[profile]['format_sort'],
+        'concurrent_fragment_downloads': max(1, fragment_concurrency),
+        'restrictfilenames': True,  # Use only ASCII characters
+        # Fetch subtitles in the same invocation as the media
+        'writesubtitles': True,
+        'writeautomaticsub': True,
+        'subtitleslangs': SUBTITLE_LANGS,
+        'subtitlesformat': 'vtt',
+        'quiet': True,
+        'no_warnings': True,
+    }
+
+    try:
+        info = _extract(ydl_class, ydl_opts, url)
+    except Exception as e:
+        # yt-dlp aborts the whole download when a subtitle track fails; retry media only
+        print(f"Download with subtitles failed ({e}), retrying without subtitles")
+        ydl_opts.update({'writesubtitles': False, 'writeautomaticsub': False})
+        info = _extract(ydl_class, ydl_opts, url)
+
+    # Find the downloaded files
+    file_location, audio_location = split_downloads(info)
+    if not file_location:
+        for file_path in os.listdir(upload_dir):
+            if file_path.startswith(job_id) and not file_path.endswith(('.part', '.ytdl')):
+                file_location = os.path.join(upload_dir, file_path)
+                break
+    if not file_location or not os.path.exists(file_location):
+        raise Exception("Downloaded file not found")
+
+    bytes_downloaded = sum(os.path.getsize(path) for path in (file_location, audio_location) if path)
+    print(f"Downloaded {bytes_downloaded} bytes with the '{profile}' profile")
+
+    with open(os.path.join(transcript_dir, INFO_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, default=str)
+
+    return {
+        'file_location': file_location,
+        'audio_location': audio_location,
+        'bytes_downloaded': bytes_downloaded,
+        'info': info,
+        'subtitle_track': select_subtitle_track(info, transcript_dir),
+    }
@@ -30,23 +30,22 @@ export function DocumentUploadContent() {
   const [isUploading, setIsUploading] = useState(false)
   const [uploadedDocuments, setUploadedDocuments] = useState<UploadedDocument[]>([])
   const [processing, setProcessing] = useState<ProcessingStatus>({ docId: null, progress: 0, stage: "", message: "" })
-  const progressInterval = useRef<NodeJS.Timeout | null>(null)
+  const progressStream = useRef<(() => void) | null>(null)
   const { toast } = useToast()
 
   // Cleanup progress tracking on unmount
   useEffect(() => {
     return () => {
-      if (progressInterval.current) {
-        clearInterval(progressInterval.current)
+      if (progressStream.current) {
+        progressStream.current()
       }
     }
   }, [])
 
   // Progress tracking function
   const trackProgress = (docId: string) => {
-    progressInterval.current = setInterval(async () => {
+    progressStream.current = api.subscribeProgress("document", docId, async (progressData) => {
       try {
-        const progressData = await api.getDocumentProgress(docId)
         setProcessing({
           docId,
           progress: progressData.progress,
@@ -55,9 +54,6 @@ export function DocumentUploadContent() {
         })
 
         if (progressData.progress >= 100 || progressData.stage === "completed") {
-          if (progressInterval.current) {
-            clearInterval(progressInterval.current)
-          }
           setIsUploading(false)
           setProcessing({ docId: null, progress: 0, stage: "", message: "" })
           
@@ -80,9 +76,6 @@ export function DocumentUploadContent() {
             }))
           )
         } else if (progressData.stage === "error") {
-          if (progressInterval.current) {
-            clearInterval(progressInterval.current)
-          }
           setIsUploading(false)
           setProcessing({ docId: null, progress: 0, stage: "", message: "" })
           
@@ -95,7 +88,7 @@ export function DocumentUploadContent() {
       } catch (error) {
         console.error("Failed to track progress:", error)
       }
-    }, 1000) // Poll every second
+    })
   }
 
   // Fetch uploaded documents from backend on mount
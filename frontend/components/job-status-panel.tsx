@@ -27,9 +27,10 @@ export function JobStatusPanel({ jobId }: JobStatusPanelProps) {
   useEffect(() => {
     if (!polling) return
 
-    const interval = setInterval(async () => {
-      try {
-        const data = await api.getVideoProgress(jobId)
+    const unsubscribe = api.subscribeProgress(
+      "video",
+      jobId,
+      (data) => {
         setProgress(data)
 
         if (data.progress >= 100 || data.stage === "completed") {
@@ -48,13 +49,14 @@ export function JobStatusPanel({ jobId }: JobStatusPanelProps) {
             variant: "destructive",
           })
         }
-      } catch (error) {
-        console.error("[v0] Failed to fetch progress:", error)
+      },
+      () => {
+        console.error("[v0] Progress stream closed")
         setError("Failed to track progress")
-      }
-    }, 2000)
+      },
+    )
 
-    return () => clearInterval(interval)
+    return unsubscribe
   }, [jobId, polling, toast])
 
   if (!progress && !error) {
@@ -131,6 +131,30 @@ class ApiService {
     return this.request(`/video/progress/${jobId}`)
   }
 
+  // Push-based progress over Server-Sent Events; returns a function that closes the stream
+  subscribeProgress(
+    kind: "video" | "document",
+    id: string,
+    onUpdate: (data: { progress: number; stage: string; message: string }) => void,
+    onError?: () => void,
+  ): () => void {
+    const source = new EventSource(`${API_BASE_URL}/${kind}/progress/${id}/stream`)
+    source.addEventListener("progress", (event) => {
+      const data = JSON.parse((event as MessageEvent).data)
+      onUpdate(data)
+      if (data.stage === "completed" || data.stage === "error") {
+        source.close()
+      }
+    })
+    source.onerror = () => {
+      // EventSource reconnects by itself unless the connection was refused outright
+      if (source.readyState === EventSource.CLOSED && onError) {
+        onError()
+      }
+    }
+    return () => source.close()
+  }
+
   // Notes endpoints
   async getNotes(): Promise<Note[]> {
     return this.request("/notes/")